@@ -0,0 +1,376 @@
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import struct
+import time
+import timeit
+import zlib
+from src.packet import Packet
+from src.clock import REAL_CLOCK, VirtualClock
+from src.eventlog import DEBUG, WARNING, EventLog
+from src.channel import UnreliableChannel
+from src.gbn import GBNSender, GBNReceiver
+from src.sr import SRSender, SRReceiver
+from src.utils import derive_seed
+
+
+class _TimestampingChannel(UnreliableChannel):
+    """Lossless channel that records when data packets are sent and ACKs arrive."""
+
+    def __init__(self, send_times: list, ack_times: list):
+        super().__init__()
+        self.send_times = send_times
+        self.ack_times = ack_times
+
+    def send(self, packet: Packet, destination_queue):
+        if not packet.flags & Packet.ACK:
+            self.send_times.append(time.perf_counter())
+        super().send(packet, destination_queue)
+
+    def _deliver(self, packet: Packet, destination_queue):
+        if destination_queue is not None and packet.flags & Packet.ACK:
+            self.ack_times.append(time.perf_counter())
+        super()._deliver(packet, destination_queue)
+
+
+def bench_ack_latency(protocol: str, packets: int):
+    """
+    Measures the time from an ACK arriving at the sender to the next data packet
+    leaving it. A window of 1 makes every send wait on exactly one ACK.
+    """
+    sends, acks = [], []
+    forward_channel = _TimestampingChannel(sends, acks)
+    backward_channel = _TimestampingChannel(sends, acks)
+
+    if protocol == "gbn":
+        receiver = GBNReceiver(backward_channel, None)  # type: ignore
+        sender = GBNSender(forward_channel, receiver.receiver_queue, 1, 1.0)
+    else:
+        receiver = SRReceiver(backward_channel, None, 1)  # type: ignore
+        sender = SRSender(forward_channel, receiver.receiver_queue, 1, 1.0)
+    receiver.sender_queue = sender.sender_queue
+
+    receiver.start()
+    sender.start()
+    sender.send_data(b"x" * (1024 * packets))
+    deadline = time.time() + 30
+    while sender.base < packets and time.time() < deadline:
+        time.sleep(0.01)
+    sender.stop()
+    receiver.stop()
+    forward_channel.close()
+    backward_channel.close()
+
+    latencies = [
+        (sends[i + 1] - acks[i]) * 1e6 for i in range(min(len(acks), len(sends) - 1))
+    ]
+    if not latencies:
+        print("No ACK/send pairs recorded")
+        return
+    latencies.sort()
+    print(f"{protocol.upper()}: ACK arrival -> next send over {len(latencies)} packets")
+    print(f"  median: {statistics.median(latencies):8.1f} us")
+    print(f"  p99:    {latencies[int(len(latencies) * 0.99) - 1]:8.1f} us")
+    print(f"  max:    {latencies[-1]:8.1f} us")
+
+
+def _legacy_checksum(packet: Packet) -> int:
+    # Previous implementation: format string parsed per call, header + payload copied
+    header = struct.pack("!III", packet.seq_num, packet.ack_num, packet.flags)
+    return zlib.crc32(header + packet.payload) & 0xFFFFFFFF
+
+
+def _legacy_to_bytes(packet: Packet) -> bytes:
+    header = struct.pack(
+        "!IIIII",
+        packet.seq_num,
+        packet.ack_num,
+        packet.flags,
+        packet.checksum,
+        len(packet.payload),
+    )
+    return header + packet.payload
+
+
+def bench_packet(payload_size: int, number: int):
+    """Per-packet cost of checksum checks, serialization and ACK creation."""
+    packet = Packet(1, 0, 0, b"x" * payload_size)
+    buffer = bytearray(packet.wire_size() * 2)
+    offset = packet.wire_size()
+
+    def legacy_write():
+        # Before pack_into, filling a batch buffer took a serialize and a copy
+        data = _legacy_to_bytes(packet)
+        buffer[offset : offset + len(data)] = data
+
+    cases = [
+        (
+            "is_corrupt",
+            lambda: _legacy_checksum(packet) != packet.checksum,
+            packet.is_corrupt,
+        ),
+        ("to_bytes", lambda: _legacy_to_bytes(packet), packet.to_bytes),
+        ("pack_into", legacy_write, lambda: packet.pack_into(buffer, offset)),
+        (
+            "build ACK",
+            lambda: Packet(seq_num=0, ack_num=7, flags=Packet.ACK),
+            lambda: Packet.ack(7),
+        ),
+    ]
+    print(f"Payload: {payload_size} bytes, {number} iterations")
+    print(f"{'operation':<12}{'before (ns)':>14}{'after (ns)':>14}{'speedup':>10}")
+    for name, before, after in cases:
+        t_before = min(timeit.repeat(before, number=number, repeat=3)) / number * 1e9
+        t_after = min(timeit.repeat(after, number=number, repeat=3)) / number * 1e9
+        print(f"{name:<12}{t_before:>14.1f}{t_after:>14.1f}{t_before / t_after:>9.2f}x")
+
+
+class _InPlaceCorruptionChannel(UnreliableChannel):
+    """The old behaviour: corruption damages the sender's own packet object."""
+
+    def _corrupt(self, packet: Packet, point: float) -> Packet:
+        if packet.flags & Packet.ACK:
+            # ACKs used to be built fresh per send; don't poison the shared cache
+            return super()._corrupt(packet, point)
+        packet.checksum = (packet.checksum + 1) % 0xFFFFFFFF
+        return packet
+
+
+def _virtual_goodput(channel_cls, protocol, corruption, data_size, window, seed):
+    """Runs one transfer on a virtual clock; returns goodput in B/s (0 if stalled)."""
+    clock = VirtualClock()
+    forward_channel = channel_cls(
+        0.0, corruption, 0.05, seed=derive_seed(seed, "forward"), clock=clock
+    )
+    backward_channel = channel_cls(
+        0.0, corruption, 0.05, seed=derive_seed(seed, "backward"), clock=clock
+    )
+    if protocol == "gbn":
+        receiver = GBNReceiver(backward_channel, None)  # type: ignore
+        sender = GBNSender(forward_channel, receiver.receiver_queue, window, 0.2)
+    else:
+        receiver = SRReceiver(backward_channel, None, window)  # type: ignore
+        sender = SRSender(forward_channel, receiver.receiver_queue, window, 0.2)
+    receiver.sender_queue = sender.sender_queue
+
+    done = receiver.expect(data_size, on_complete=clock.stop)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sender.send_data(b"x" * data_size)
+        clock.run(until=300.0)
+    sender.stop()
+    receiver.stop()
+    return data_size / clock.now() if done.is_set() else 0.0
+
+
+def bench_corruption(protocol: str, data_size: int, window: int, seed: int):
+    """Goodput against corruption rate, with in-place vs copy-on-corrupt channels."""
+    print(
+        f"{protocol.upper()}: {data_size} bytes, window {window}, 50 ms delay, "
+        "virtual clock"
+    )
+    print(f"{'corruption':<12}{'in-place (B/s)':>16}{'copy (B/s)':>16}")
+    for rate in (0.0, 0.01, 0.02, 0.05, 0.1, 0.2):
+        before = _virtual_goodput(
+            _InPlaceCorruptionChannel, protocol, rate, data_size, window, seed
+        )
+        after = _virtual_goodput(
+            UnreliableChannel, protocol, rate, data_size, window, seed
+        )
+        print(f"{rate:<12}{before:>16.0f}{after:>16.0f}")
+
+
+class _TimedSRSender(SRSender):
+    """
+    SRSender that accumulates the CPU time spent in process_ack, excluding the
+    window refills it triggers (the same work under every ACK scheme).
+    """
+
+    ack_time = 0.0
+    _in_ack = False
+
+    def process_ack(self, packet: Packet):
+        start = time.process_time()
+        self._in_ack = True
+        super().process_ack(packet)
+        self._in_ack = False
+        self.ack_time += time.process_time() - start
+
+    def _fill_window(self):
+        start = time.process_time()
+        super()._fill_window()
+        if self._in_ack:
+            self.ack_time -= time.process_time() - start
+
+
+def bench_acks(data_size: int, window: int, loss: float, seed: int):
+    """Reverse-path packets and sender ACK-processing CPU, per ACK scheme."""
+    schemes = [
+        ("per-packet", dict()),
+        ("sack", dict(sack=True)),
+        ("sack/4", dict(sack=True, ack_every=4, ack_delay=0.01)),
+        ("sack/16", dict(sack=True, ack_every=16, ack_delay=0.02)),
+    ]
+    print(
+        f"SR: {data_size} bytes, window {window}, loss {loss}, 20 ms delay, "
+        "virtual clock"
+    )
+    print(f"{'ACKs':<12}{'sent':>8}{'ack CPU (ms)':>14}{'goodput (B/s)':>16}")
+    for name, options in schemes:
+        clock = VirtualClock()
+        forward_channel = UnreliableChannel(
+            loss, 0.0, 0.02, seed=derive_seed(seed, "forward"), clock=clock
+        )
+        backward_channel = UnreliableChannel(
+            loss, 0.0, 0.02, seed=derive_seed(seed, "backward"), clock=clock
+        )
+        receiver = SRReceiver(backward_channel, None, window, **options)  # type: ignore
+        sender = _TimedSRSender(forward_channel, receiver.receiver_queue, window, 0.3)
+        receiver.sender_queue = sender.sender_queue
+
+        done = receiver.expect(data_size, on_complete=clock.stop)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sender.send_data(b"x" * data_size)
+            clock.run(until=300.0)
+        sender.stop()
+        receiver.stop()
+        goodput = data_size / clock.now() if done.is_set() else 0.0
+        print(
+            f"{name:<12}{receiver.acks_sent:>8}"
+            f"{sender.ack_time * 1000:>14.1f}{goodput:>16.0f}"
+        )
+
+
+def bench_logging(
+    protocol: str, data_size: int, window: int, clock_mode: str, seed: int
+):
+    """Transfer time with protocol event logging off and at debug level, per sink."""
+    sinks = [
+        ("off", dict(level=WARNING)),
+        ("ring", dict(level=DEBUG, ring_size=10000)),
+        ("file", dict(level=DEBUG, stream="file")),
+        ("stdout", dict(level=DEBUG)),
+    ]
+    print(
+        f"{protocol.upper()}: {data_size} bytes, window {window}, loss 0.01, "
+        f"5 ms delay, {clock_mode} clock"
+    )
+    print(f"{'logging':<10}{'time (s)':>10}{'MB/s':>10}")
+    for name, options in sinks:
+        clock = VirtualClock() if clock_mode == "virtual" else REAL_CLOCK
+        with contextlib.ExitStack() as stack:
+            if options.get("stream") == "file":
+                options = dict(
+                    options,
+                    stream=stack.enter_context(
+                        open(os.devnull, "w", buffering=1 << 16)
+                    ),
+                )
+            # Stands in for a terminal, without measuring the terminal itself
+            stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+            events = EventLog(clock=clock, **options)
+            forward_channel = UnreliableChannel(
+                0.01,
+                0.0,
+                0.005,
+                seed=derive_seed(seed, "forward"),
+                clock=clock,
+                events=events,
+            )
+            backward_channel = UnreliableChannel(
+                0.01,
+                0.0,
+                0.005,
+                seed=derive_seed(seed, "backward"),
+                clock=clock,
+                events=events,
+            )
+            if protocol == "gbn":
+                receiver = GBNReceiver(backward_channel, None)  # type: ignore
+                sender = GBNSender(
+                    forward_channel, receiver.receiver_queue, window, 0.1
+                )
+            else:
+                receiver = SRReceiver(backward_channel, None, window)  # type: ignore
+                sender = SRSender(forward_channel, receiver.receiver_queue, window, 0.1)
+            receiver.sender_queue = sender.sender_queue
+
+            start = time.perf_counter()
+            receiver.start()
+            sender.start()
+            done = receiver.expect(
+                data_size, on_complete=clock.stop if clock.virtual else None
+            )
+            sender.send_data(b"x" * data_size)
+            if clock.virtual:
+                clock.run(until=300.0)
+            else:
+                done.wait(120)
+            elapsed = time.perf_counter() - start
+            sender.stop()
+            receiver.stop()
+            forward_channel.close()
+            backward_channel.close()
+        rate = data_size / elapsed / 1e6 if done.is_set() else 0.0
+        print(f"{name:<10}{elapsed:>10.3f}{rate:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RDT Lab micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    latency = subparsers.add_parser(
+        "latency", help="Time from ACK arrival to the next send"
+    )
+    latency.add_argument("--protocol", choices=["gbn", "sr"], default="gbn")
+    latency.add_argument("--packets", type=int, default=500)
+
+    packet = subparsers.add_parser(
+        "packet", help="Per-packet checksum, serialization and ACK costs"
+    )
+    packet.add_argument("--payload", type=int, default=1024)
+    packet.add_argument("--number", type=int, default=100000)
+
+    corruption = subparsers.add_parser(
+        "corruption",
+        help="Goodput against corruption rate, before/after copy-on-corrupt",
+    )
+    corruption.add_argument("--protocol", choices=["gbn", "sr"], default="sr")
+    corruption.add_argument("--size", type=int, default=200000)
+    corruption.add_argument("--window", type=int, default=8)
+    corruption.add_argument("--seed", type=int, default=1)
+
+    acks = subparsers.add_parser(
+        "acks", help="Per-packet ACKs against selective ACKs with coalescing"
+    )
+    acks.add_argument("--size", type=int, default=2000000)
+    acks.add_argument("--window", type=int, default=128)
+    acks.add_argument("--loss", type=float, default=0.02)
+    acks.add_argument("--seed", type=int, default=1)
+
+    logging = subparsers.add_parser(
+        "logging", help="Transfer time with protocol event logging on and off"
+    )
+    logging.add_argument("--protocol", choices=["gbn", "sr"], default="sr")
+    logging.add_argument("--size", type=int, default=5000000)
+    logging.add_argument("--window", type=int, default=32)
+    logging.add_argument("--clock", choices=["real", "virtual"], default="virtual")
+    logging.add_argument("--seed", type=int, default=1)
+
+    args = parser.parse_args()
+
+    if args.bench == "latency":
+        bench_ack_latency(args.protocol, args.packets)
+    elif args.bench == "packet":
+        bench_packet(args.payload, args.number)
+    elif args.bench == "corruption":
+        bench_corruption(args.protocol, args.size, args.window, args.seed)
+    elif args.bench == "acks":
+        bench_acks(args.size, args.window, args.loss, args.seed)
+    elif args.bench == "logging":
+        bench_logging(args.protocol, args.size, args.window, args.clock, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,32 @@
+import heapq
+import itertools
 import random
-import time
 import queue
 import threading
+import time
 from typing import Optional
 from src.packet import Packet
+from src.clock import REAL_CLOCK
+from src.channel_models import BernoulliLoss, UniformDelay
+from src.eventlog import DEFAULT_EVENTS
+from src.metrics import NULL_METRICS
 
 
 class UnreliableChannel:
     """
     Simulates an unreliable channel with packet loss, corruption, delay, and reordering.
+    Impairments are applied to a wire-level copy; the sender's packet is never modified.
+    Loss and delay come from pluggable models (see channel_models), defaulting to
+    independent loss at `loss_rate` and `avg_delay` +/- 50%; a TraceReplay
+    overrides both with recorded per-packet values.
+    An optional BottleneckLink adds queueing and serialization time ahead of
+    the propagation delay, and drops packets its queue cannot hold.
     """
 
+    # "checksum": the checksum field is damaged
+    # "bitflip": a single random bit of the payload is flipped
+    CORRUPTION_MODELS = ("checksum", "bitflip")
+
     def __init__(
         self,
         loss_rate: float = 0.0,
@@ -19,71 +35,238 @@ class UnreliableChannel:
         reorder_rate: float = 0.0,
         seed: Optional[int] = None,
         observer=None,
+        clock=None,
+        corruption_model: str = "checksum",
+        schedule=None,
+        loss_model=None,
+        delay_model=None,
+        trace=None,
+        link=None,
+        metrics=None,
+        name: str = "channel",
+        events=None,
     ):
         self.loss_rate = loss_rate
         self.corruption_rate = corruption_rate
         self.avg_delay = avg_delay
         self.reorder_rate = reorder_rate
+        if corruption_model not in self.CORRUPTION_MODELS:
+            raise ValueError(f"Unknown corruption model: {corruption_model}")
+        self.corruption_model = corruption_model
         self.observer = observer
-        if seed is not None:
-            random.seed(seed)
+        # Time source for delays; endpoints using this channel share it
+        self.clock = clock or REAL_CLOCK
+        # Shared with the endpoints using this channel; recorded under `name`
+        self.metrics = metrics or NULL_METRICS
+        self.name = name
+        # Metric names, built once rather than per packet
+        self._metric_sent = f"{name}.sent"
+        self._metric_lost = f"{name}.lost"
+        self._metric_queue_drops = f"{name}.queue_drops"
+        self._metric_corrupted = f"{name}.corrupted"
+        self._metric_delivered = f"{name}.delivered"
+        self._metric_delay = f"{name}.delay"
+        # EventLog for the endpoints' protocol events
+        self.events = events or DEFAULT_EVENTS
+        # Private generator: channels never share or reseed the global one
+        self.rng = random.Random(seed)
+        self.loss_model = loss_model or BernoulliLoss(loss_rate)
+        self.delay_model = delay_model or UniformDelay(avg_delay)
+        self.trace = trace
+        self.link = link
+        # Optional precomputed ImpairmentSchedule; replaces per-packet draws
+        self.schedule = schedule
+
+        # Packets in transit: (delivery_time, counter, packet, destination_queue).
+        # A destination of None marks a lost packet whose loss is yet to be reported.
+        # Serviced by a single worker thread under the real clock.
+        self._in_transit = []
+        self._counter = itertools.count()
+        self._wakeup = threading.Condition()
+        self._worker = None
+        self._closed = False
 
-        # Queue to hold packets in transit: (delivery_time, packet)
-        self.packet_queue = queue.PriorityQueue()
         self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    @property
+    def reorders(self) -> bool:
+        """Whether a packet can overtake one sent before it: any delay variation."""
+        source = self.schedule or self
+        if self.trace is not None or source.reorder_rate > 0:
+            return True
+        if self.schedule is None and not isinstance(self.delay_model, UniformDelay):
+            return True
+        return source.avg_delay > 0
 
     def send(self, packet: Packet, destination_queue: queue.Queue):
         """
         Sends a packet through the channel.
         """
-        # Calculate delay first for visualization
-        # Base delay
-        delay = (
-            self.avg_delay + random.uniform(-self.avg_delay * 0.5, self.avg_delay * 0.5)
-            if self.avg_delay > 0
-            else 0
-        )
-
-        # Reordering: add extra random delay to some packets
-        if random.random() < self.reorder_rate:
-            delay += random.uniform(
-                0.1, 0.5
-            )  # Add significant delay to cause reordering
+        delay, lost, loss_point, corrupt, corrupt_point = self._draw()
+        if self.link is not None:
+            with self.lock:
+                hold = self.link.enqueue(self.clock.now(), packet.wire_size())
+            if hold is None:
+                # Dropped at the bottleneck queue, before reaching the wire
+                lost, loss_point = True, 0.0
+                self.metrics.inc(self._metric_queue_drops)
+            else:
+                delay += hold
+        self.metrics.inc(self._metric_sent)
 
         # Notify observer that packet is sent
         if self.observer:
             self.observer.packet_sent(packet, delay)
 
         # 1. Packet Loss
-        if random.random() < self.loss_rate:
+        if lost:
+            self.metrics.inc(self._metric_lost)
             if self.observer:
                 # Simulate loss occurring mid-transit
-                threading.Timer(
-                    delay * random.uniform(0.2, 0.8),
-                    self.observer.packet_lost,
-                    args=[packet],
-                ).start()
+                self._schedule(delay * loss_point, packet, None)
             return
 
         # 2. Corruption
-        if random.random() < self.corruption_rate:
-            # Corrupt the packet (e.g., flip a bit in payload or checksum)
-            # For simplicity, we just change the checksum to be invalid
-            packet.checksum = (packet.checksum + 1) % 0xFFFFFFFF
+        if corrupt:
+            self.metrics.inc(self._metric_corrupted)
             if self.observer:
                 self.observer.packet_corrupted(packet)
+            packet = self._corrupt(packet, corrupt_point)
 
-        delivery_time = time.time() + delay
+        with self.lock:
+            self.in_flight += 1
+            if self.in_flight > self.peak_in_flight:
+                self.peak_in_flight = self.in_flight
+        self.metrics.observe(self._metric_delay, delay)
 
-        # We use a thread to deliver packets asynchronously
-        threading.Thread(
-            target=self._deliver, args=(packet, destination_queue, delay)
-        ).start()
+        # Deliver asynchronously once the delay has elapsed
+        self._schedule(delay, packet, destination_queue)
 
-    def _deliver(self, packet: Packet, destination_queue: queue.Queue, delay: float):
+    def _draw(self):
+        """
+        Draws one packet's impairments:
+        (delay, lost, loss_point, corrupt, corrupt_point).
+        Every call takes the same number of values from the channel's generator,
+        whatever the outcome, so the k-th packet through a channel with a given
+        seed always meets the same fate.
+        """
+        if self.schedule is not None:
+            return self.schedule.next()
+
+        rng = self.rng
+        with self.lock:
+            if self.trace is None:
+                delay = self.delay_model.sample(rng)
+            reorder = rng.random() < self.reorder_rate
+            reorder_delay = rng.uniform(0.1, 0.5)
+            if self.trace is None:
+                lost = self.loss_model.lost(rng)
+            else:
+                lost, delay = self.trace.next()
+            loss_point = rng.uniform(0.2, 0.8)
+            corrupt = rng.random() < self.corruption_rate
+            corrupt_point = rng.random()
+
+        # Reordering: add significant extra delay to some packets
+        if reorder:
+            delay += reorder_delay
+        return delay, lost, loss_point, corrupt, corrupt_point
+
+    def _corrupt(self, packet: Packet, point: float) -> Packet:
+        """
+        Returns a damaged copy of the packet as it would arrive off the wire.
+        `point` in [0, 1) picks the bit flipped by the bitflip model.
+        """
+        if self.corruption_model == "bitflip" and packet.payload:
+            payload = bytearray(packet.payload)
+            bit = int(point * len(payload) * 8)
+            payload[bit >> 3] ^= 1 << (bit & 7)
+            return Packet(
+                packet.seq_num,
+                packet.ack_num,
+                packet.flags,
+                bytes(payload),
+                packet.checksum,
+            )
+        # Checksum model, and payload-less packets such as ACKs
+        return Packet(
+            packet.seq_num,
+            packet.ack_num,
+            packet.flags,
+            packet.payload,
+            (packet.checksum + 1) % 0xFFFFFFFF,
+        )
+
+    def _schedule(self, delay: float, packet: Packet, destination_queue):
+        """Queues a packet for delivery (a loss report if destination_queue is None)."""
+        if self.clock.virtual:
+            self.clock.call_later(delay, self._deliver, packet, destination_queue)
+            return
+
+        with self._wakeup:
+            if self._closed:
+                return
+            entry = (
+                time.time() + delay,
+                next(self._counter),
+                packet,
+                destination_queue,
+            )
+            heapq.heappush(self._in_transit, entry)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run_worker, daemon=True)
+                self._worker.start()
+            elif self._in_transit[0] is entry:
+                # New earliest deadline: wake the worker so it can re-arm its wait
+                self._wakeup.notify()
+
+    def _run_worker(self):
+        """Delivers packets in delivery-time order until the channel is closed."""
+        with self._wakeup:
+            while not self._closed:
+                if not self._in_transit:
+                    self._wakeup.wait()
+                    continue
+                wait = self._in_transit[0][0] - time.time()
+                if wait > 0:
+                    self._wakeup.wait(wait)
+                    continue
+                _, _, packet, destination_queue = heapq.heappop(self._in_transit)
+
+                # Don't hold the heap while running endpoint and observer callbacks
+                self._wakeup.release()
+                try:
+                    self._deliver(packet, destination_queue)
+                except Exception as e:
+                    # Keep delivering: one failing endpoint mustn't stall the channel
+                    self.events.error(
+                        "channel", "deliver_failed", name=self.name, error=e
+                    )
+                finally:
+                    self._wakeup.acquire()
+
+    def _deliver(self, packet: Packet, destination_queue):
         """Helper to deliver packet after delay."""
-        if delay > 0:
-            time.sleep(delay)
+        if destination_queue is None:
+            if self.observer:
+                self.observer.packet_lost(packet)
+            return
+
+        with self.lock:
+            self.in_flight -= 1
+        self.metrics.inc(self._metric_delivered)
         destination_queue.put(packet)
         if self.observer:
             self.observer.packet_delivered(packet)
+
+    def close(self):
+        """Stops the delivery worker. Packets still in transit are discarded."""
+        with self._wakeup:
+            self._closed = True
+            self._in_transit.clear()
+            self._wakeup.notify()
+        worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join()
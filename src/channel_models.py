@@ -0,0 +1,294 @@
+import array
+import collections
+import functools
+import random
+from typing import Iterable, Optional
+
+# --- Loss models: lost(rng) -> bool, called once per packet ---
+
+
+class BernoulliLoss:
+    """Each packet is lost independently with probability `rate`."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+
+    def lost(self, rng) -> bool:
+        return rng.random() < self.rate
+
+    def mean_loss(self) -> float:
+        return self.rate
+
+
+class GilbertElliottLoss:
+    """
+    Two-state Markov burst-loss model. Before each packet the channel moves
+    Good -> Bad with probability `p` and Bad -> Good with probability `r`,
+    then loses the packet with the loss probability of the state it is in.
+    Bursts in the Bad state last 1/r packets on average.
+    """
+
+    def __init__(
+        self, p: float, r: float, loss_bad: float = 1.0, loss_good: float = 0.0
+    ):
+        for name, value in (
+            ("p", p),
+            ("r", r),
+            ("loss_bad", loss_bad),
+            ("loss_good", loss_good),
+        ):
+            if not 0.0 <= value <= 1.0:
+                raise ValueError(f"Gilbert-Elliott {name} must be in 0..1, got {value}")
+        self.p = p
+        self.r = r
+        self.loss_bad = loss_bad
+        self.loss_good = loss_good
+        self.bad = False  # Current state; starts Good
+
+    def lost(self, rng) -> bool:
+        # Always two draws, whatever the state, to keep the generator in step
+        transition = rng.random()
+        loss = rng.random()
+        if self.bad:
+            self.bad = transition >= self.r
+        else:
+            self.bad = transition < self.p
+        return loss < (self.loss_bad if self.bad else self.loss_good)
+
+    def mean_loss(self) -> float:
+        """Long-run loss rate from the stationary state distribution."""
+        if self.p + self.r == 0:
+            return self.loss_good
+        bad = self.p / (self.p + self.r)
+        return bad * self.loss_bad + (1 - bad) * self.loss_good
+
+
+# --- Delay models: sample(rng) -> seconds, called once per packet ---
+
+
+class UniformDelay:
+    """Average delay +/- 50%, uniformly distributed."""
+
+    def __init__(self, avg_delay: float):
+        self.avg_delay = avg_delay
+
+    def sample(self, rng) -> float:
+        jitter = rng.uniform(-0.5, 0.5)
+        return self.avg_delay * (1 + jitter) if self.avg_delay > 0 else 0
+
+
+class EmpiricalDelay:
+    """Delays resampled uniformly from measured values (in seconds)."""
+
+    def __init__(self, samples: Iterable[float], scale: float = 1.0):
+        self.samples = array.array("d", samples)
+        if not self.samples:
+            raise ValueError("Empirical delay model needs at least one sample")
+        self.scale = scale
+
+    def sample(self, rng) -> float:
+        samples = self.samples
+        return samples[int(rng.random() * len(samples))] * self.scale
+
+
+# --- Trace replay ---
+
+
+class PacketTrace:
+    """Recorded per-packet loss flags and delays, held in compact typed arrays."""
+
+    def __init__(self, lost: Iterable[int], delays: Iterable[float]):
+        self.lost = array.array("b", lost)
+        self.delays = array.array("d", delays)
+        if len(self.lost) != len(self.delays):
+            raise ValueError("Trace loss flags and delays differ in length")
+        if not self.lost:
+            raise ValueError("Trace is empty")
+
+    def __len__(self) -> int:
+        return len(self.lost)
+
+
+class TraceReplay:
+    """
+    Replays a PacketTrace one entry per packet, wrapping around at the end.
+    Each channel gets its own replay; the trace itself is shared read-only.
+    """
+
+    def __init__(self, trace: PacketTrace, scale: float = 1.0):
+        self.trace = trace
+        self.scale = scale
+        self.position = 0
+
+    def next(self) -> tuple:
+        """Returns (lost, delay) for the next packet."""
+        i = self.position
+        self.position = i + 1 if i + 1 < len(self.trace) else 0
+        return bool(self.trace.lost[i]), self.trace.delays[i] * self.scale
+
+
+def _read_columns(path: str) -> list:
+    """Whitespace/comma separated tokens of a text file, skipping '#' comments."""
+    with open(path) as f:
+        text = f.read()
+    if "#" in text:
+        text = "\n".join(line.split("#", 1)[0] for line in text.splitlines())
+    return text.replace(",", " ").split()
+
+
+@functools.lru_cache(maxsize=8)
+def load_trace(path: str) -> PacketTrace:
+    """
+    Loads a trace file with one packet per line: a loss flag (0/1) and a delay
+    in seconds, separated by whitespace or a comma. The file is tokenized in
+    one pass and converted column-wise, so million-packet traces load in about
+    a second; repeated loads of the same path are cached.
+    """
+    tokens = _read_columns(path)
+    if len(tokens) % 2:
+        raise ValueError(f"{path}: each trace line needs a loss flag and a delay")
+    return PacketTrace(map(int, tokens[0::2]), map(float, tokens[1::2]))
+
+
+@functools.lru_cache(maxsize=8)
+def load_delay_samples(path: str) -> tuple:
+    """Loads delay samples in seconds, whitespace/comma separated."""
+    return tuple(map(float, _read_columns(path)))
+
+
+# --- Model specs, as given on the command line ---
+
+
+def make_loss_model(spec: str, loss_rate: float):
+    """
+    Builds a loss model from a spec:
+    "bernoulli" (independent loss at `loss_rate`) or
+    "gilbert:P:R[:LOSS_BAD[:LOSS_GOOD]]" (Gilbert-Elliott burst loss).
+    """
+    name, _, args = spec.partition(":")
+    if name == "bernoulli":
+        return BernoulliLoss(loss_rate)
+    if name == "gilbert":
+        values = [float(x) for x in args.split(":")] if args else []
+        if not 2 <= len(values) <= 4:
+            raise ValueError(
+                "Gilbert-Elliott spec is gilbert:P:R[:LOSS_BAD[:LOSS_GOOD]]"
+            )
+        return GilbertElliottLoss(*values)
+    raise ValueError(f"Unknown loss model: {spec}")
+
+
+def make_delay_model(spec: str, avg_delay: float, scale: float = 1.0):
+    """
+    Builds a delay model from a spec:
+    "uniform" (`avg_delay` +/- 50%) or "empirical:PATH" (resample delays from a file).
+    `scale` multiplies empirical delays; "uniform" takes an already scaled `avg_delay`.
+    """
+    name, _, args = spec.partition(":")
+    if name == "uniform":
+        return UniformDelay(avg_delay)
+    if name == "empirical":
+        if not args:
+            raise ValueError("Empirical delay spec is empirical:PATH")
+        return EmpiricalDelay(load_delay_samples(args), scale)
+    raise ValueError(f"Unknown delay model: {spec}")
+
+
+# --- Bottleneck link ---
+
+
+class BottleneckLink:
+    """
+    A link of `bandwidth` bits/s fed by a FIFO queue of at most `queue_limit`
+    packets (including the one being transmitted). Arrivals to a full queue are
+    tail-dropped. With `red` = (min_th, max_th, max_p), arrivals are also dropped
+    early with a probability rising linearly from 0 at an average queue of min_th
+    packets to max_p at max_th, and always beyond max_th (simplified RED: the
+    average is an EWMA taken at each arrival, with no idle-time decay).
+    RED draws from the link's own generator, seeded by `seed`, so turning it on
+    leaves the channel's per-packet random stream unchanged.
+    Not thread-safe; the owning channel serializes calls.
+    """
+
+    RED_WEIGHT = 0.002
+
+    def __init__(
+        self,
+        bandwidth: float,
+        queue_limit: int = 100,
+        red=None,
+        seed: Optional[int] = None,
+    ):
+        if bandwidth <= 0:
+            raise ValueError("Link bandwidth must be positive")
+        if queue_limit < 1:
+            raise ValueError("Link queue must hold at least one packet")
+        self.bandwidth = bandwidth
+        self.queue_limit = queue_limit
+        self.red = red
+        self.rng = random.Random(seed)
+        self._departures = collections.deque()  # Finish times of queued packets
+        self._avg_queue = 0.0
+
+        self.drops = 0  # Tail drops
+        self.early_drops = 0  # RED drops
+        self.forwarded = 0
+        self.total_queueing_delay = 0.0
+        self.max_queueing_delay = 0.0
+        self.peak_queue = 0
+
+    def enqueue(self, now: float, size: int) -> Optional[float]:
+        """
+        Offers a `size`-byte packet at time `now`. Returns how long until its last
+        bit leaves the link (queueing plus serialization), or None if it was dropped.
+        """
+        departures = self._departures
+        while departures and departures[0] <= now:
+            departures.popleft()
+        queued = len(departures)
+
+        if self.red is not None:
+            # Always one draw while RED is on, dropped or not
+            draw = self.rng.random()
+            min_th, max_th, max_p = self.red
+            self._avg_queue += self.RED_WEIGHT * (queued - self._avg_queue)
+            if self._avg_queue >= max_th:
+                probability = 1.0
+            elif self._avg_queue > min_th:
+                probability = max_p * (self._avg_queue - min_th) / (max_th - min_th)
+            else:
+                probability = 0.0
+            if draw < probability:
+                self.early_drops += 1
+                return None
+
+        if queued >= self.queue_limit:
+            self.drops += 1
+            return None
+
+        start = departures[-1] if departures else now
+        finish = start + size * 8 / self.bandwidth
+        departures.append(finish)
+
+        queueing_delay = start - now
+        self.forwarded += 1
+        self.total_queueing_delay += queueing_delay
+        if queueing_delay > self.max_queueing_delay:
+            self.max_queueing_delay = queueing_delay
+        if queued + 1 > self.peak_queue:
+            self.peak_queue = queued + 1
+        return finish - now
+
+    def avg_queueing_delay(self) -> float:
+        return self.total_queueing_delay / self.forwarded if self.forwarded else 0.0
+
+
+def parse_red(spec: str) -> tuple:
+    """Parses a RED spec "MIN_TH:MAX_TH:MAX_P" (thresholds in packets)."""
+    try:
+        min_th, max_th, max_p = (float(x) for x in spec.split(":"))
+    except ValueError:
+        raise ValueError("RED spec is MIN_TH:MAX_TH:MAX_P") from None
+    if not 0 <= min_th < max_th or not 0 < max_p <= 1:
+        raise ValueError("RED needs 0 <= MIN_TH < MAX_TH and 0 < MAX_P <= 1")
+    return min_th, max_th, max_p
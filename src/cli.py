@@ -1,17 +1,100 @@
 import argparse
-import time
-import queue
+import csv
+import hashlib
+import itertools
+import json
+import os
 import random
 import string
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from dataclasses import asdict, dataclass, fields
+from typing import Optional
+from src.stats import summarize
+from src.clock import REAL_CLOCK, VirtualClock
 from src.channel import UnreliableChannel
 from src.gbn import GBNSender, GBNReceiver
 from src.sr import SRSender, SRReceiver
+from src.utils import derive_seed
+from src.rto import RTOEstimator
+from src.congestion import AIMDController
+from src.impairment import ImpairmentSchedule, load_schedules, save_schedules
+from src.metrics import Metrics
+from src.eventlog import LEVELS, EventLog
+from src.eventtrace import TraceRecorder, read_trace, trace_stats
+from src.channel_models import (
+    BottleneckLink,
+    TraceReplay,
+    load_trace,
+    make_delay_model,
+    make_loss_model,
+    parse_red,
+)
 
 
-def generate_random_data(size: int) -> bytes:
-    return "".join(
-        random.choices(string.ascii_letters + string.digits, k=size)
-    ).encode()
+@dataclass
+class ExperimentResult:
+    """Parameters and outcome of one run_experiment call."""
+
+    protocol: str
+    data_size: int
+    loss_rate: float
+    corruption_rate: float
+    delay: float
+    reorder_rate: float
+    window_size: int
+    timeout: float
+    clock_mode: str
+    seed: Optional[int]
+    corruption_model: str
+    segment_size: int
+    seq_bits: int
+    loss_model: str
+    delay_model: str
+    trace: Optional[str]
+    bandwidth: float  # Bottleneck bits per second; 0 for no bottleneck
+    queue_limit: int
+    red: Optional[str]
+    rto_mode: str
+    dup_ack_threshold: int  # GBN only
+    sack: bool  # SR only, as are ack_every and ack_delay
+    ack_every: int
+    ack_delay: float
+    congestion: str
+    # Outcome
+    completed: bool
+    duration: float
+    throughput: float  # Delivered bytes per second
+    integrity: bool
+    delivered_bytes: int
+    peak_in_flight_packets: int
+    peak_in_flight_acks: int
+    retransmissions: int
+    timeout_retransmissions: int
+    fast_retransmissions: int
+    acks_sent: int  # Reverse-path packets
+    queue_drops: int  # Forward-direction bottleneck drops (tail and RED)
+    avg_queueing_delay: float
+    max_queueing_delay: float
+    srtt: Optional[float]  # Sender's smoothed RTT estimate; None without samples
+    rttvar: Optional[float]
+    final_rto: float
+    rtt_samples: int
+    avg_cwnd: Optional[float]  # Time-weighted usable window; None without AIMD
+    final_cwnd: Optional[float]
+    congestion_events: int  # Window cuts: losses plus timeouts
+
+
+# ExperimentResult fields that are run_experiment arguments, in argument order
+_RESULT_FIELDS = [f.name for f in fields(ExperimentResult)]
+PARAM_FIELDS = _RESULT_FIELDS[: _RESULT_FIELDS.index("completed")]
+
+
+def generate_random_data(size: int, rng: Optional[random.Random] = None) -> bytes:
+    rng = rng or random.Random()
+    return "".join(rng.choices(string.ascii_letters + string.digits, k=size)).encode()
 
 
 def run_experiment(
@@ -23,87 +106,710 @@ def run_experiment(
     reorder_rate: float,
     window_size: int,
     timeout: float,
-):
+    clock_mode: str = "real",
+    seed: Optional[int] = None,
+    corruption_model: str = "checksum",
+    segment_size: int = 1024,
+    seq_bits: int = 32,
+    loss_model: str = "bernoulli",
+    delay_model: str = "uniform",
+    trace: Optional[str] = None,
+    bandwidth: float = 0.0,
+    queue_limit: int = 100,
+    red: Optional[str] = None,
+    rto_mode: str = "fixed",
+    dup_ack_threshold: int = 3,
+    sack: bool = False,
+    ack_every: int = 1,
+    ack_delay: float = 0.0,
+    congestion: str = "none",
+    schedules: Optional[dict] = None,
+    cwnd_log: Optional[str] = None,
+    metrics_path: Optional[str] = None,
+    metrics_interval: float = 0.0,
+    log_level: str = "warning",
+    log_file: Optional[str] = None,
+    log_ring: int = 0,
+    record_path: Optional[str] = None,
+) -> ExperimentResult:
+    """
+    Runs one transfer. `loss_model` and `delay_model` are channel_models specs
+    applied in both directions; `trace` names a per-packet trace file replayed
+    on the forward (data) channel. A positive `bandwidth` (bits/s) puts a
+    bottleneck link with a `queue_limit`-packet queue (RED if `red` is given) in
+    each direction. `rto_mode` "adaptive" replaces the fixed `timeout` with an
+    RTT-based RTO that starts from it. `dup_ack_threshold` duplicate ACKs make a
+    GBN sender go back before its timer expires (0 disables). With `sack`, the SR
+    receiver sends cumulative+bitmap ACKs, one per `ack_every` packets or
+    `ack_delay` seconds after the first unacknowledged one. `congestion` "aimd"
+    lets the sender's window float under `window_size`; `cwnd_log` names a CSV
+    file for its trajectory. `schedules` optionally maps "forward"/"backward" to
+    precomputed ImpairmentSchedules that drive the channels instead of their RNGs.
+    `metrics_path` names a JSON file for the run's counters, histograms and time
+    series, written at the end and, with a positive `metrics_interval`, every
+    that many (clock) seconds while the transfer is running.
+    Protocol events at `log_level` and above go to stdout or, buffered, to
+    `log_file`; with a positive `log_ring` only the last that many are kept and
+    written out at the end. `record_path` names a binary event trace of every
+    packet sent, lost, corrupted and delivered in either direction.
+    """
+    red_params = parse_red(red) if red else None
+
+    def make_link(direction):
+        if bandwidth <= 0:
+            return None
+        return BottleneckLink(
+            bandwidth,
+            queue_limit,
+            red_params,
+            seed=derive_seed(seed, direction, "link"),
+        )
 
-    print(f"--- Starting Experiment: {protocol.upper()} ---")
-    print(f"Data Size: {data_size} bytes")
-    print(f"Loss Rate: {loss_rate}, Corruption Rate: {corruption_rate}")
-    print(f"Delay: {delay}, Reorder Rate: {reorder_rate}")
-    print(f"Window Size: {window_size}, Timeout: {timeout}")
+    # With a virtual clock every delay and timeout is an event on one heap,
+    # so the whole run happens on this thread without sleeping.
+    clock = VirtualClock() if clock_mode == "virtual" else REAL_CLOCK
+    metrics = Metrics(clock) if metrics_path else None
+    log_stream = open(log_file, "w", buffering=1 << 16) if log_file else None
+    events = EventLog(LEVELS[log_level], log_stream, log_ring, clock)
+    recorder = TraceRecorder(record_path, clock) if record_path else None
 
     # Forward channel: Sender -> Receiver
     # Backward channel: Receiver -> Sender (ACKs)
 
-    forward_channel = UnreliableChannel(loss_rate, corruption_rate, delay, reorder_rate)
+    forward_channel = UnreliableChannel(
+        loss_rate,
+        corruption_rate,
+        delay,
+        reorder_rate,
+        seed=derive_seed(seed, "forward"),
+        observer=recorder,
+        clock=clock,
+        corruption_model=corruption_model,
+        schedule=schedules and schedules.get("forward"),
+        loss_model=make_loss_model(loss_model, loss_rate),
+        delay_model=make_delay_model(delay_model, delay),
+        trace=TraceReplay(load_trace(trace)) if trace else None,
+        link=make_link("forward"),
+        metrics=metrics,
+        name="forward",
+        events=events,
+    )
     backward_channel = UnreliableChannel(
-        loss_rate, corruption_rate, delay, reorder_rate
+        loss_rate,
+        corruption_rate,
+        delay,
+        reorder_rate,
+        seed=derive_seed(seed, "backward"),
+        observer=recorder,
+        clock=clock,
+        corruption_model=corruption_model,
+        schedule=schedules and schedules.get("backward"),
+        loss_model=make_loss_model(loss_model, loss_rate),
+        delay_model=make_delay_model(delay_model, delay),
+        link=make_link("backward"),
+        metrics=metrics,
+        name="backward",
+        events=events,
     )
 
     # Sender -> forward_channel -> receiver_input_queue -> Receiver
     # Receiver -> backward_channel -> sender_input_queue -> Sender
 
     if protocol == "gbn":
-        receiver = GBNReceiver(backward_channel, None, window_size)  # type: ignore
+        receiver = GBNReceiver(backward_channel, None, seq_bits=seq_bits)
         sender = GBNSender(
-            forward_channel, receiver.receiver_queue, window_size, timeout
+            forward_channel,
+            receiver.receiver_queue,
+            window_size,
+            timeout,
+            segment_size=segment_size,
+            seq_bits=seq_bits,
+            rto=rto_mode,
+            dup_ack_threshold=dup_ack_threshold,
+            congestion=congestion,
         )
-        receiver.sender_queue = sender.sender_queue  
+        receiver.sender_queue = sender.sender_queue
 
     elif protocol == "sr":
-        receiver = SRReceiver(backward_channel, None, window_size)
+        receiver = SRReceiver(
+            backward_channel,
+            None,
+            window_size,
+            segment_size=segment_size,
+            seq_bits=seq_bits,
+            sack=sack,
+            ack_every=ack_every,
+            ack_delay=ack_delay,
+        )
         sender = SRSender(
-            forward_channel, receiver.receiver_queue, window_size, timeout
+            forward_channel,
+            receiver.receiver_queue,
+            window_size,
+            timeout,
+            segment_size=segment_size,
+            seq_bits=seq_bits,
+            rto=rto_mode,
+            congestion=congestion,
         )
         receiver.sender_queue = sender.sender_queue
 
     # Generate data
-    data = generate_random_data(data_size)
+    data = generate_random_data(data_size, random.Random(derive_seed(seed, "data")))
 
     # Start threads
     receiver.start()
     sender.start()
 
-    start_time = time.time()
+    start_time = clock.now()
+    limit = timeout * data_size / 100 + 10  # Rough timeout
+    # The receiver signals as soon as the last byte is delivered
+    # Only the digest is needed for the integrity check: keep memory to a window
+    done = receiver.expect(
+        data_size, on_complete=clock.stop if clock.virtual else None, keep_data=False
+    )
     sender.send_data(data)
 
-    # Wait for completion
-    # How do we know when it's done?
-    # Receiver should have received all data.
-    # But Receiver doesn't know total size.
-    # We can check `len(receiver.get_received_data()) == data_size`.
+    if metrics and metrics_interval > 0 and clock.virtual:
+        # Simulated seconds: dump from the event loop
+
+        def dump_metrics():
+            if not done.is_set():
+                metrics.to_json(metrics_path)
+                clock.call_later(metrics_interval, dump_metrics)
 
-    while True:
-        received_len = len(receiver.get_received_data())
-        if received_len >= data_size:
-            break
-        time.sleep(0.1)
+        clock.call_later(metrics_interval, dump_metrics)
+    dump_stop = threading.Event()
+    dump_thread = None
+    if metrics and metrics_interval > 0 and not clock.virtual:
+        # File I/O on a thread of its own, not the timer wheel that runs the
+        # protocol timeouts
+        def dump_metrics_loop():
+            while not dump_stop.wait(metrics_interval) and not done.is_set():
+                metrics.to_json(metrics_path)
 
-        # Timeout safety
-        if time.time() - start_time > timeout * data_size / 100 + 10:  # Rough timeout
-            print("Experiment Timed Out!")
-            break
+        dump_thread = threading.Thread(target=dump_metrics_loop, daemon=True)
+        dump_thread.start()
+
+    if clock.virtual:
+        if not done.is_set():
+            clock.run(until=start_time + limit)
+    else:
+        done.wait(limit)
 
-    end_time = time.time()
+    end_time = clock.now()
     duration = end_time - start_time
-    throughput = data_size / duration  # bytes per second
+    delivered = receiver.delivered_bytes
+    # Bytes per second
+    throughput = delivered / duration if duration > 0 else float("inf")
 
-    print(f"Experiment Finished.")
-    print(f"Time: {duration:.4f} s")
-    print(f"Throughput: {throughput:.2f} B/s")
+    link = forward_channel.link
+    cc = sender.cc
+    result = ExperimentResult(
+        protocol,
+        data_size,
+        loss_rate,
+        corruption_rate,
+        delay,
+        reorder_rate,
+        window_size,
+        timeout,
+        clock_mode,
+        seed,
+        corruption_model,
+        segment_size,
+        seq_bits,
+        loss_model,
+        delay_model,
+        trace,
+        bandwidth,
+        queue_limit,
+        red,
+        rto_mode,
+        dup_ack_threshold,
+        sack,
+        ack_every,
+        ack_delay,
+        congestion,
+        completed=done.is_set(),
+        duration=duration,
+        throughput=throughput,
+        integrity=receiver.received_digest() == hashlib.sha256(data).digest(),
+        delivered_bytes=delivered,
+        peak_in_flight_packets=forward_channel.peak_in_flight,
+        peak_in_flight_acks=backward_channel.peak_in_flight,
+        retransmissions=sender.retransmissions,
+        timeout_retransmissions=sender.timeout_retransmissions,
+        fast_retransmissions=sender.fast_retransmissions,
+        acks_sent=receiver.acks_sent,
+        queue_drops=link.drops + link.early_drops if link else 0,
+        avg_queueing_delay=link.avg_queueing_delay() if link else 0.0,
+        max_queueing_delay=link.max_queueing_delay if link else 0.0,
+        srtt=sender.rtt.srtt,
+        rttvar=sender.rtt.rttvar,
+        final_rto=sender.rtt.rto,
+        rtt_samples=sender.rtt.samples,
+        avg_cwnd=cc.average_window(end_time) if cc else None,
+        final_cwnd=cc.cwnd if cc else None,
+        congestion_events=cc.losses + cc.timeouts if cc else 0,
+    )
+    if cc and cwnd_log:
+        with open(cwnd_log, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time", "cwnd", "ssthresh"])
+            for t, cwnd, ssthresh in cc.history:
+                writer.writerow(
+                    [f"{t - start_time:.6f}", f"{cwnd:.4f}", f"{ssthresh:.4f}"]
+                )
+    if dump_thread:
+        dump_stop.set()
+        dump_thread.join()
+    if metrics:
+        metrics.to_json(metrics_path)
+
+    # Stop threads before closing the log their late timers may still write to
+    sender.stop()
+    receiver.stop()
+    forward_channel.close()
+    backward_channel.close()
+    if recorder:
+        recorder.close()
+    events.dump()
+    if log_stream:
+        log_stream.close()
+    return result
 
-    # Verify data
-    if receiver.get_received_data() == data:
+
+def print_header(params: dict):
+    print(f"--- Starting Experiment: {params['protocol'].upper()} ---")
+    print(f"Data Size: {params['data_size']} bytes")
+    print(
+        f"Loss Rate: {params['loss_rate']}, "
+        f"Corruption Rate: {params['corruption_rate']} "
+        f"({params['corruption_model']})"
+    )
+    print(f"Delay: {params['delay']}, Reorder Rate: {params['reorder_rate']}")
+    print(f"Loss Model: {params['loss_model']}, Delay Model: {params['delay_model']}")
+    if params["trace"]:
+        print(f"Trace: {params['trace']} (forward channel)")
+    print(
+        f"Window Size: {params['window_size']}, Timeout: {params['timeout']}, "
+        f"Segment Size: {params['segment_size']}"
+    )
+    print(f"Sequence Number Bits: {params['seq_bits']}")
+    if params["bandwidth"] > 0:
+        red = f", RED {params['red']}" if params["red"] else ""
+        print(
+            f"Bottleneck: {params['bandwidth']:g} bit/s, "
+            f"queue {params['queue_limit']} packets{red}"
+        )
+    print(
+        f"Clock: {params['clock_mode']}, RTO: {params['rto_mode']}, "
+        f"Congestion Control: {params['congestion']}"
+    )
+    if params["protocol"] == "gbn":
+        threshold = params["dup_ack_threshold"]
+        print(
+            f"Fast Retransmit: {f'{threshold} duplicate ACKs' if threshold else 'off'}"
+        )
+    elif params["sack"]:
+        print(
+            f"Selective ACKs: every {params['ack_every']} packets "
+            f"or {params['ack_delay']} s"
+        )
+
+
+def print_result(result: ExperimentResult):
+    if not result.completed:
+        print("Experiment Timed Out!")
+    print(f"Experiment Finished.")
+    print(f"Time: {result.duration:.4f} s")
+    print(f"Throughput: {result.throughput:.2f} B/s")
+    print(
+        f"Peak In-Flight: {result.peak_in_flight_packets} packets, "
+        f"{result.peak_in_flight_acks} ACKs"
+    )
+    print(
+        f"Retransmissions: {result.retransmissions} "
+        f"({result.timeout_retransmissions} on timeout, "
+        f"{result.fast_retransmissions} fast)"
+    )
+    print(f"ACKs Sent: {result.acks_sent}")
+    if result.srtt is not None:
+        print(
+            f"RTT: SRTT {result.srtt * 1000:.2f} ms, "
+            f"RTTVAR {result.rttvar * 1000:.2f} ms, "
+            f"final RTO {result.final_rto * 1000:.2f} ms ({result.rtt_samples} samples)"
+        )
+    if result.avg_cwnd is not None:
+        print(
+            f"Congestion Window: avg {result.avg_cwnd:.2f}, "
+            f"final {result.final_cwnd:.2f} "
+            f"packets, {result.congestion_events} cuts"
+        )
+    if result.bandwidth > 0:
+        print(
+            f"Bottleneck Queue: {result.queue_drops} drops, queueing delay "
+            f"avg {result.avg_queueing_delay * 1000:.2f} ms, "
+            f"max {result.max_queueing_delay * 1000:.2f} ms"
+        )
+    if result.integrity:
         print("Data Integrity: PASS")
     else:
         print("Data Integrity: FAIL")
-        print(f"Sent: {len(data)}, Received: {len(receiver.get_received_data())}")
+        print(f"Sent: {result.data_size}, Received: {result.delivered_bytes}")
 
-    # Stop threads
-    sender.stop()
-    receiver.stop()
 
+# --- Parameter sweeps ---
+
+# Sweep option -> (run_experiment parameter, value type, default spec)
+SWEEP_PARAMS = {
+    "protocol": ("protocol", str, "gbn,sr"),
+    "size": ("data_size", int, "10000"),
+    "loss": ("loss_rate", float, "0.0"),
+    "corruption": ("corruption_rate", float, "0.0"),
+    "delay": ("delay", float, "0.0"),
+    "reorder": ("reorder_rate", float, "0.0"),
+    "window": ("window_size", int, "4"),
+    "timeout": ("timeout", float, "1.0"),
+    "segment_size": ("segment_size", int, "1024"),
+    "seq_bits": ("seq_bits", int, "32"),
+    "loss_model": ("loss_model", str, "bernoulli"),
+    "delay_model": ("delay_model", str, "uniform"),
+    "bandwidth": ("bandwidth", float, "0"),
+    "queue": ("queue_limit", int, "100"),
+}
+
+
+def parse_values(spec: str, kind=float) -> list:
+    """
+    Parses a sweep value spec: a comma-separated list ("0,0.05,0.1"),
+    an inclusive range "start:stop:step" ("0:0.2:0.05"), or a mix of both.
+    """
+    values = []
+    for part in spec.split(","):
+        part = part.strip()
+        if ":" in part and kind is not str:
+            start, stop, step = (kind(x) for x in part.split(":"))
+            if step <= 0:
+                raise ValueError(f"Range step must be positive: {part}")
+            n = int(round((stop - start) / step, 9)) + 1
+            values.extend(
+                kind(round(start + i * step, 10)) if kind is float else start + i * step
+                for i in range(n)
+            )
+        else:
+            values.append(kind(part))
+    return values
+
+
+def _point_key(params: dict) -> tuple:
+    """
+    Identifies a sweep point in a form that survives a CSV or JSONL round trip.
+    Parameters missing from older results files never match a new point.
+    """
+    return tuple("" if params.get(f) is None else str(params[f]) for f in PARAM_FIELDS)
+
+
+def _completed_keys(path: str, fmt: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            return {_point_key(row) for row in csv.DictReader(f)}
+        keys = set()
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    keys.add(_point_key(json.loads(line)))
+                except ValueError:
+                    continue  # Partially written last line of an interrupted sweep
+        return keys
+
+
+def _run_point(params: dict) -> dict:
+    """Process-pool worker: runs one sweep point with protocol chatter discarded."""
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        return asdict(run_experiment(**params))
+
+
+def run_sweep(points: list, output: str, fmt: str, workers: Optional[int] = None):
+    """
+    Runs every sweep point on a process pool and appends each result to
+    `output` as soon as it finishes. Points already in `output` are skipped,
+    so an interrupted sweep resumes where it stopped.
+    """
+    done = _completed_keys(output, fmt)
+    pending = [p for p in points if _point_key(p) not in done]
+    print(
+        f"Sweep: {len(points)} points, {len(points) - len(pending)} already done, "
+        f"{len(pending)} to run"
+    )
+    if not pending:
+        return
+
+    write_header = fmt == "csv" and (
+        not os.path.exists(output) or os.path.getsize(output) == 0
+    )
+    with open(output, "a", newline="") as f, ProcessPoolExecutor(workers) as pool:
+        writer = None
+        if fmt == "csv":
+            writer = csv.DictWriter(
+                f, fieldnames=[fl.name for fl in fields(ExperimentResult)]
+            )
+            if write_header:
+                writer.writeheader()
+        futures = {pool.submit(_run_point, p): p for p in pending}
+        for finished, future in enumerate(as_completed(futures), 1):
+            params = futures[future]
+            try:
+                record = future.result()
+            # Bad point (e.g. window too large): report, keep going
+            except Exception as e:
+                print(
+                    f"[{finished}/{len(pending)}] {params} failed: {e}", file=sys.stderr
+                )
+                continue
+            if writer:
+                writer.writerow(record)
+            else:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            print(
+                f"[{finished}/{len(pending)}] {record['protocol']} "
+                f"loss={record['loss_rate']} ({record['loss_model']}) "
+                f"delay={record['delay']} "
+                f"window={record['window_size']}: {record['throughput']:.2f} B/s"
+            )
+
+
+# --- Replicated trials ---
+
+# ExperimentResult field -> label for the trials summary
+TRIAL_METRICS = {
+    "throughput": "throughput (B/s)",
+    "retransmissions": "retransmissions",
+    "duration": "completion time (s)",
+}
+
+
+def run_trials(
+    params: dict,
+    trials: int,
+    workers: Optional[int] = None,
+    ci_target: Optional[float] = None,
+    min_trials: int = 3,
+):
+    """
+    Runs up to `trials` independently seeded replications of one experiment on
+    a process pool. With `ci_target`, stops once the 95% CI half-width of
+    throughput is below that fraction of its mean. Only the longest run of
+    consecutive finished trials (by index) is used for that check, so fast
+    trials finishing first cannot bias the estimate. A trial that raises is
+    reported and left out; the others still count.
+    Returns (results in trial order, whether it stopped early, failed trial indices).
+    """
+    base_seed = (
+        params["seed"] if params["seed"] is not None else random.randrange(2**31)
+    )
+    workers = workers or os.cpu_count() or 1
+    results = {}  # Trial index -> result, or None if it failed
+    stopped_early = False
+
+    with ProcessPoolExecutor(workers) as pool:
+        running = {}
+        next_trial = 0
+        while next_trial < trials or running:
+            while next_trial < trials and len(running) < workers and not stopped_early:
+                trial_params = dict(params, seed=base_seed + next_trial)
+                running[pool.submit(_run_point, trial_params)] = next_trial
+                next_trial += 1
+            if not running:
+                break
+
+            future = next(as_completed(running))
+            trial = running.pop(future)
+            if future.cancelled():
+                continue  # Dropped on an early stop: neither a result nor a failure
+            try:
+                results[trial] = future.result()
+            except Exception as e:
+                print(
+                    f"Trial {trial} (seed {base_seed + trial}) failed: {e}",
+                    file=sys.stderr,
+                )
+                results[trial] = None
+
+            prefix = []
+            index = 0
+            while index in results:
+                if results[index] is not None:
+                    prefix.append(results[index]["throughput"])
+                index += 1
+            if (
+                ci_target is not None
+                and not stopped_early
+                and len(prefix) >= min_trials
+                and summarize(prefix).relative_half_width < ci_target
+            ):
+                stopped_early = True
+                for pending in running:
+                    pending.cancel()
+
+    ordered = []
+    index = 0
+    while index in results:
+        if results[index] is not None:
+            ordered.append(results[index])
+        index += 1
+    failed = sorted(trial for trial, result in results.items() if result is None)
+    return ordered, stopped_early, failed
+
+
+def print_trials(
+    results: list,
+    trials: int,
+    stopped_early: bool,
+    ci_target: Optional[float],
+    failed: tuple = (),
+):
+    note = ""
+    if stopped_early:
+        note = f" (stopped early: throughput CI within {ci_target:.1%} of mean)"
+    print(f"Trials: {len(results)} of {trials}{note}")
+    if failed:
+        print(f"Failed: {len(failed)} (trials {', '.join(map(str, failed))})")
+    if not results:
+        return
+    incomplete = sum(not r["completed"] for r in results)
+    if incomplete:
+        print(f"Timed out: {incomplete}")
+    print(f"{'metric':<22}{'mean':>14}{'stddev':>14}{'95% CI':>28}")
+    for field, label in TRIAL_METRICS.items():
+        summary = summarize([r[field] for r in results])
+        low = summary.mean - summary.half_width
+        high = summary.mean + summary.half_width
+        ci = f"[{low:.4g}, {high:.4g}]"
+        print(f"{label:<22}{summary.mean:>14.4g}{summary.stddev:>14.4g}{ci:>28}")
+
+
+def sweep_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli sweep",
+        description="Run a grid of experiments in parallel. Each option takes a "
+        "comma-separated list and/or inclusive start:stop:step ranges.",
+    )
+    for option, (_, _, default) in SWEEP_PARAMS.items():
+        parser.add_argument(f"--{option.replace('_', '-')}", default=default)
+    parser.add_argument(
+        "--corruption-model",
+        choices=UnreliableChannel.CORRUPTION_MODELS,
+        default="checksum",
+    )
+    parser.add_argument("--clock", choices=["real", "virtual"], default="virtual")
+    parser.add_argument("--trace", default=None, help="Trace file for every point")
+    parser.add_argument("--rto", choices=RTOEstimator.MODES, default="fixed")
+    parser.add_argument("--dup-acks", type=int, default=3)
+    parser.add_argument("--sack", action="store_true")
+    parser.add_argument("--congestion", choices=AIMDController.MODES, default="none")
+    parser.add_argument("--ack-every", type=int, default=1)
+    parser.add_argument("--ack-delay", type=float, default=0.0)
+    parser.add_argument("--red", default=None, help="RED spec for every point")
+    parser.add_argument(
+        "--seed", type=int, default=None, help="Random seed for every point"
+    )
+    parser.add_argument(
+        "--output", required=True, help="Results file (.csv, or JSON lines otherwise)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes (default: all cores)",
+    )
+    args = parser.parse_args(argv)
+
+    grid = {
+        name: parse_values(getattr(args, option), kind)
+        for option, (name, kind, _) in SWEEP_PARAMS.items()
+    }
+    points = [dict(zip(grid, combo)) for combo in itertools.product(*grid.values())]
+    for point in points:
+        point.update(
+            clock_mode=args.clock,
+            seed=args.seed,
+            corruption_model=args.corruption_model,
+            trace=args.trace,
+            red=args.red,
+            rto_mode=args.rto,
+            dup_ack_threshold=args.dup_acks,
+            sack=args.sack,
+            ack_every=args.ack_every,
+            ack_delay=args.ack_delay,
+            congestion=args.congestion,
+        )
+
+    fmt = "csv" if args.output.endswith(".csv") else "jsonl"
+    run_sweep(points, args.output, fmt, args.workers)
+
+
+# --- Event trace analysis ---
+
+
+def trace_stats_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli trace-stats",
+        description="Summarize an event trace recorded with --record (needs NumPy).",
+    )
+    parser.add_argument("trace", help="Event trace file")
+    parser.add_argument(
+        "--interval", type=float, default=None, help="Goodput bin width in seconds"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    stats = trace_stats(read_trace(args.trace), args.interval)
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return
+
+    print(f"Events: {stats['events']} over {stats['duration']:.4f} s")
+    for direction, counts in stats["counts"].items():
+        print(
+            f"  {direction:<5} "
+            + ", ".join(f"{name} {n}" for name, n in counts.items())
+        )
+    print(
+        f"Segments: {stats['segments']} sent, {stats['segments_delivered']} delivered, "
+        f"retransmission ratio {stats['retransmission_ratio']:.2%}"
+    )
+    print(f"Goodput: {stats['goodput']:.2f} B/s")
+    for label, key in (
+        ("Packet latency", "latency"),
+        ("Channel delay", "channel_delay"),
+    ):
+        p = stats[key]
+        if p:
+            print(
+                f"{label}: mean {p['mean'] * 1000:.2f} ms, "
+                f"p50 {p['p50'] * 1000:.2f} ms, "
+                f"p90 {p['p90'] * 1000:.2f} ms, p99 {p['p99'] * 1000:.2f} ms, "
+                f"max {p['max'] * 1000:.2f} ms"
+            )
+    print(f"{'time (s)':>12}{'goodput (B/s)':>16}")
+    for t, goodput in stats["goodput_series"]:
+        print(f"{t:>12.4f}{goodput:>16.2f}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "sweep":
+        sweep_main(argv[1:])
+        return
+    if argv and argv[0] == "trace-stats":
+        trace_stats_main(argv[1:])
+        return
 
-def main():
     parser = argparse.ArgumentParser(
         description="RDT Lab: Selective Repeat vs Go-Back-N"
     )
@@ -117,27 +823,284 @@ def main():
     parser.add_argument(
         "--corruption", type=float, default=0.0, help="Packet corruption rate (0.0-1.0)"
     )
+    parser.add_argument(
+        "--corruption-model",
+        choices=UnreliableChannel.CORRUPTION_MODELS,
+        default="checksum",
+        help="How corrupted packets are damaged",
+    )
     parser.add_argument(
         "--delay", type=float, default=0.0, help="Average delay in seconds"
     )
     parser.add_argument(
         "--reorder", type=float, default=0.0, help="Reordering rate (0.0-1.0)"
     )
+    parser.add_argument(
+        "--loss-model",
+        default="bernoulli",
+        help="Loss model: 'bernoulli' (independent, at --loss) or "
+        "'gilbert:P:R[:LOSS_BAD[:LOSS_GOOD]]' (Gilbert-Elliott burst loss)",
+    )
+    parser.add_argument(
+        "--delay-model",
+        default="uniform",
+        help="Delay model: 'uniform' (--delay +/- 50%%) or 'empirical:PATH' "
+        "(resample delays in seconds listed in a file)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Replay a per-packet trace (lines of 'lost delay') on the data channel, "
+        "replacing its loss and delay models",
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        default=0.0,
+        help="Bottleneck link rate in bits/s (e.g. 1e6); 0 for no bottleneck",
+    )
+    parser.add_argument(
+        "--queue",
+        type=int,
+        default=100,
+        help="Bottleneck queue capacity in packets (tail-drop)",
+    )
+    parser.add_argument(
+        "--red",
+        metavar="MIN:MAX:MAXP",
+        help="Drop early at the bottleneck with RED (thresholds in packets)",
+    )
     parser.add_argument("--window", type=int, default=4, help="Window size")
     parser.add_argument("--timeout", type=float, default=1.0, help="Timeout in seconds")
+    parser.add_argument(
+        "--rto",
+        choices=RTOEstimator.MODES,
+        default="fixed",
+        help="Retransmission timeout: always --timeout, or adaptive "
+        "(Jacobson/Karels RTT estimation with Karn's rule and exponential "
+        "backoff, starting at --timeout)",
+    )
+    parser.add_argument(
+        "--dup-acks",
+        type=int,
+        default=3,
+        help="GBN: duplicate ACKs that trigger a fast retransmit (0 disables)",
+    )
+    parser.add_argument(
+        "--sack",
+        action="store_true",
+        help="SR: cumulative ACKs with a selective-ACK bitmap of the window",
+    )
+    parser.add_argument(
+        "--ack-every",
+        type=int,
+        default=1,
+        help="SR with --sack: send one ACK per this many packets",
+    )
+    parser.add_argument(
+        "--ack-delay",
+        type=float,
+        default=0.0,
+        help="SR with --sack: longest an ACK is held back, in seconds",
+    )
+    parser.add_argument(
+        "--congestion",
+        choices=AIMDController.MODES,
+        default="none",
+        help="aimd: slow start, congestion avoidance and multiplicative decrease, "
+        "with --window as the receiver-imposed maximum",
+    )
+    parser.add_argument(
+        "--cwnd-log",
+        metavar="PATH",
+        help="With --congestion aimd, write the congestion window trajectory as CSV",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="Write counters, latency histograms and time series as JSON at the "
+        "end of the run",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=0.0,
+        metavar="SECONDS",
+        help="With --metrics, also rewrite the file this often during the run",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="PATH",
+        help="Record every packet event as a binary trace "
+        "(see the trace-stats command)",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=list(LEVELS),
+        default="warning",
+        help="Protocol event verbosity: info adds timeouts and fast retransmits, "
+        "debug every packet and ACK",
+    )
+    parser.add_argument(
+        "--log-file",
+        metavar="PATH",
+        help="Write protocol events here instead of stdout",
+    )
+    parser.add_argument(
+        "--log-ring",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Keep only the last N protocol events, written out when the run ends",
+    )
+    parser.add_argument(
+        "--segment-size", type=int, default=1024, help="Payload bytes per packet"
+    )
+    parser.add_argument(
+        "--seq-bits",
+        type=int,
+        default=32,
+        help="Sequence number width in bits. Below 32 needs an in-order channel: "
+        "--delay 0, with no --reorder, empirical --delay-model or --trace",
+    )
+    parser.add_argument(
+        "--clock",
+        choices=["real", "virtual"],
+        default="real",
+        help="Run against wall-clock time or a discrete-event virtual clock",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="Precompute impairment decisions in NumPy blocks",
+    )
+    parser.add_argument(
+        "--save-schedule",
+        metavar="PATH",
+        help="Save the impairment schedules used by this run "
+        "(.npz; implies --vectorized)",
+    )
+    parser.add_argument(
+        "--load-schedule",
+        metavar="PATH",
+        help="Replay impairment schedules from a file; their rates replace "
+        "--loss/--corruption/--delay/--reorder",
+    )
+    parser.add_argument(
+        "--trials",
+        type=int,
+        default=1,
+        help="Run this many independently seeded replications and report statistics",
+    )
+    parser.add_argument(
+        "--ci-target",
+        type=float,
+        default=None,
+        help="With --trials, stop once the 95%% CI half-width of throughput is "
+        "below this fraction of the mean (e.g. 0.05)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes for --trials"
+    )
+
+    args = parser.parse_args(argv)
+
+    params = dict(
+        protocol=args.protocol,
+        data_size=args.size,
+        loss_rate=args.loss,
+        corruption_rate=args.corruption,
+        delay=args.delay,
+        reorder_rate=args.reorder,
+        window_size=args.window,
+        timeout=args.timeout,
+        clock_mode=args.clock,
+        seed=args.seed,
+        corruption_model=args.corruption_model,
+        segment_size=args.segment_size,
+        seq_bits=args.seq_bits,
+        loss_model=args.loss_model,
+        delay_model=args.delay_model,
+        trace=args.trace,
+        bandwidth=args.bandwidth,
+        queue_limit=args.queue,
+        red=args.red,
+        rto_mode=args.rto,
+        dup_ack_threshold=args.dup_acks,
+        sack=args.sack,
+        ack_every=args.ack_every,
+        ack_delay=args.ack_delay,
+        congestion=args.congestion,
+    )
+    uses_models = (
+        args.loss_model != "bernoulli" or args.delay_model != "uniform" or args.trace
+    )
+    if uses_models and (args.vectorized or args.save_schedule or args.load_schedule):
+        parser.error("impairment schedules only support the bernoulli/uniform models")
+    if args.trials > 1:
+        single_run = {
+            "--vectorized": args.vectorized,
+            "--save-schedule": args.save_schedule,
+            "--load-schedule": args.load_schedule,
+            "--cwnd-log": args.cwnd_log,
+            "--metrics": args.metrics,
+            "--log-level": args.log_level != "warning",
+            "--log-file": args.log_file,
+            "--log-ring": args.log_ring,
+            "--record": args.record,
+        }
+        used = [option for option, value in single_run.items() if value]
+        if used:
+            parser.error(f"{', '.join(used)} cannot be combined with --trials")
+    schedules = None
+    if args.load_schedule:
+        schedules = load_schedules(args.load_schedule)
+        # The recorded rates replace the command line's, in the header and results
+        forward = schedules["forward"]
+        params.update(
+            loss_rate=forward.loss_rate,
+            corruption_rate=forward.corruption_rate,
+            delay=forward.avg_delay,
+            reorder_rate=forward.reorder_rate,
+        )
+    print_header(params)
+    if args.trials > 1:
+        results, stopped_early, failed = run_trials(
+            params, args.trials, args.workers, args.ci_target
+        )
+        print_trials(results, args.trials, stopped_early, args.ci_target, failed)
+        return
 
-    args = parser.parse_args()
+    if schedules is None and (args.vectorized or args.save_schedule):
+        schedules = {
+            name: ImpairmentSchedule(
+                args.loss,
+                args.corruption,
+                args.delay,
+                args.reorder,
+                derive_seed(args.seed, name),
+            )
+            for name in ("forward", "backward")
+        }
 
-    run_experiment(
-        args.protocol,
-        args.size,
-        args.loss,
-        args.corruption,
-        args.delay,
-        args.reorder,
-        args.window,
-        args.timeout,
+    result = run_experiment(
+        **params,
+        schedules=schedules,
+        cwnd_log=args.cwnd_log,
+        metrics_path=args.metrics,
+        metrics_interval=args.metrics_interval,
+        log_level=args.log_level,
+        log_file=args.log_file,
+        log_ring=args.log_ring,
+        record_path=args.record,
     )
+    print_result(result)
+    if args.metrics:
+        print(f"Metrics written to {args.metrics}")
+    if args.save_schedule:
+        save_schedules(args.save_schedule, schedules)
+        print(f"Impairment schedules saved to {args.save_schedule}")
 
 
 if __name__ == "__main__":
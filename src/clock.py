@@ -0,0 +1,214 @@
+import heapq
+import itertools
+import math
+import queue
+import threading
+import time
+from typing import Callable, Optional
+from src.eventlog import DEFAULT_EVENTS
+
+
+class Inbox:
+    """
+    Queue stand-in used under a virtual clock.
+    Instead of buffering packets for a listener thread, it hands each one
+    straight to the endpoint's handler.
+    """
+
+    def __init__(self, handler: Callable):
+        self.handler = handler
+
+    def put(self, item):
+        self.handler(item)
+
+
+class ScheduledEvent:
+    """Handle returned by `call_later`; `cancel()` keeps the callback from running."""
+
+    __slots__ = ("time", "callback", "args", "cancelled", "wheel")
+
+    def __init__(self, when: float, callback: Callable, args: tuple):
+        self.time = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self.wheel = None  # TimerWheel whose slot still holds this event
+
+    def cancel(self):
+        self.cancelled = True
+        wheel = self.wheel
+        if wheel is not None:
+            wheel._discard(self)
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel serviced by a single thread.
+    A timer is added to the slot its expiry tick hashes to, so arming is O(1);
+    slots are insertion-ordered dicts keyed by event, so cancelling removes a
+    timer from its slot in O(1) too, however many share it, and a wheel with
+    only cancelled timers goes idle and releases their callbacks at once.
+    Each slot holds timers for every revolution; a timer fires once the wheel
+    reaches its absolute tick. Callbacks run on the wheel thread and should be short;
+    one that raises is logged to DEFAULT_EVENTS and the wheel carries on.
+    """
+
+    def __init__(self, tick: float = 0.005, slots: int = 512):
+        self.tick = tick
+        self.slots = slots
+        self._wheel = [{} for _ in range(slots)]
+        self._origin = time.monotonic()
+        self._ticks = 0  # Last tick processed
+        self._armed = 0  # Entries still sitting in slots
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def call_later(self, delay: float, callback: Callable, *args) -> ScheduledEvent:
+        with self._cond:
+            now_tick = (time.monotonic() - self._origin) / self.tick
+            if self._armed == 0:
+                # Nothing pending: skip the idle ticks instead of sweeping them
+                self._ticks = int(now_tick)
+            target = max(self._ticks + 1, math.ceil(now_tick + delay / self.tick))
+            event = ScheduledEvent(target, callback, args)
+            event.wheel = self
+            self._wheel[target % self.slots][event] = None
+            self._armed += 1
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            elif self._armed == 1:
+                self._cond.notify()
+        return event
+
+    def _discard(self, event: ScheduledEvent):
+        """Takes a cancelled event out of its slot, unless it already left it."""
+        with self._cond:
+            if event.wheel is None:
+                return
+            event.wheel = None
+            del self._wheel[event.time % self.slots][event]
+            self._armed -= 1
+
+    def _run(self):
+        with self._cond:
+            while True:
+                if self._armed == 0:
+                    self._cond.wait()
+                    continue
+                wait = self._origin + (self._ticks + 1) * self.tick - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+
+                self._ticks += 1
+                index = self._ticks % self.slots
+                slot = self._wheel[index]
+                if not slot:
+                    continue
+                due = [event for event in slot if event.time <= self._ticks]
+                if not due:
+                    continue
+                self._armed -= len(due)
+                for event in due:
+                    del slot[event]
+                    event.wheel = None
+
+                self._cond.release()
+                try:
+                    for event in due:
+                        if event.cancelled:
+                            continue
+                        try:
+                            event.callback(*event.args)
+                        except Exception as e:
+                            # One failing timer must not stop the shared wheel thread
+                            DEFAULT_EVENTS.error(
+                                "clock",
+                                "callback_failed",
+                                callback=getattr(
+                                    event.callback, "__qualname__", event.callback
+                                ),
+                                error=e,
+                            )
+                finally:
+                    self._cond.acquire()
+
+
+class RealClock:
+    """
+    Wall-clock time source. Callbacks are serviced by one shared timer wheel,
+    and endpoints receive packets through regular queues serviced by listener threads.
+    """
+
+    virtual = False
+
+    def __init__(self):
+        self.timers = TimerWheel()
+
+    def now(self) -> float:
+        return time.time()
+
+    def call_later(self, delay: float, callback: Callable, *args) -> ScheduledEvent:
+        return self.timers.call_later(delay, callback, *args)
+
+    def inbox(self, handler: Callable):
+        return queue.Queue()
+
+
+class VirtualClock:
+    """
+    Discrete-event engine: an event heap plus a virtual clock.
+    Nothing sleeps. `run()` pops events in time order and jumps the clock
+    straight to each one, so a simulation finishes in CPU time.
+    Events scheduled for the same instant run in the order they were scheduled.
+    """
+
+    virtual = True
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+        self._events = []
+        self._counter = itertools.count()
+        self._stopped = False
+
+    def now(self) -> float:
+        return self._now
+
+    def call_later(self, delay: float, callback: Callable, *args) -> ScheduledEvent:
+        event = ScheduledEvent(self._now + max(delay, 0.0), callback, args)
+        heapq.heappush(self._events, (event.time, next(self._counter), event))
+        return event
+
+    def inbox(self, handler: Callable) -> Inbox:
+        return Inbox(handler)
+
+    def pending(self) -> int:
+        return len(self._events)
+
+    def stop(self):
+        """Makes `run()` return after the event currently being processed."""
+        self._stopped = True
+
+    def run(self, until: Optional[float] = None) -> float:
+        """
+        Processes events until the heap is empty, `stop()` is called,
+        or the next event lies beyond `until`. Returns the virtual time reached.
+        """
+        self._stopped = False
+        events = self._events
+        while events and not self._stopped:
+            when, _, event = events[0]
+            if until is not None and when > until:
+                self._now = until
+                break
+            heapq.heappop(events)
+            if event.cancelled:
+                continue
+            self._now = when
+            event.callback(*event.args)
+        return self._now
+
+
+REAL_CLOCK = RealClock()
@@ -0,0 +1,67 @@
+from typing import List, Tuple
+
+
+class AIMDController:
+    """
+    Additive-increase/multiplicative-decrease congestion window, in packets.
+    Slow start grows cwnd by one per acknowledged packet until it reaches
+    ssthresh; congestion avoidance then grows it by about one per window.
+    A loss halves it (into ssthresh); a timeout also restarts slow start from 1.
+    The usable window never exceeds `max_window`, the receiver-imposed limit.
+    Every change is appended to `history` as (time, cwnd, ssthresh).
+    """
+
+    MODES = ("none", "aimd")
+
+    def __init__(self, max_window: int, clock, initial_window: float = 1.0):
+        self.max_window = max_window
+        self.clock = clock
+        self.cwnd = float(initial_window)
+        self.ssthresh = float(max_window)
+        self.losses = 0
+        self.timeouts = 0
+        self.history: List[Tuple[float, float, float]] = []
+        self._record()
+
+    @property
+    def window(self) -> int:
+        """Packets the sender may have outstanding."""
+        return max(1, min(int(self.cwnd), self.max_window))
+
+    def _record(self):
+        self.history.append((self.clock.now(), self.cwnd, self.ssthresh))
+
+    def on_ack(self, packets: int):
+        """`packets` newly acknowledged packets."""
+        if self.cwnd >= self.max_window:
+            return
+        if self.cwnd < self.ssthresh:
+            self.cwnd = min(self.cwnd + packets, self.ssthresh)
+        else:
+            self.cwnd += packets / self.cwnd
+        self.cwnd = min(self.cwnd, float(self.max_window))
+        self._record()
+
+    def on_loss(self):
+        """Loss inferred without a timeout (e.g. duplicate ACKs)."""
+        self.losses += 1
+        self.ssthresh = max(self.cwnd / 2, 2.0)
+        self.cwnd = self.ssthresh
+        self._record()
+
+    def on_timeout(self):
+        self.timeouts += 1
+        self.ssthresh = max(self.cwnd / 2, 2.0)
+        self.cwnd = 1.0
+        self._record()
+
+    def average_window(self, until: float) -> float:
+        """Time-weighted mean usable window from the first record to `until`."""
+        history = self.history
+        span = until - history[0][0]
+        if span <= 0:
+            return float(self.window)
+        total = 0.0
+        for (t, cwnd, _), (t_next, _, _) in zip(history, history[1:] + [(until, 0, 0)]):
+            total += max(1, min(int(cwnd), self.max_window)) * (min(t_next, until) - t)
+        return total / span
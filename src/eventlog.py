@@ -0,0 +1,92 @@
+import collections
+import sys
+import threading
+import time
+from typing import Optional, TextIO
+
+ERROR = 40
+WARNING = 30
+INFO = 20
+DEBUG = 10
+LEVELS = {"error": ERROR, "warning": WARNING, "info": INFO, "debug": DEBUG}
+_LEVEL_NAMES = {value: name.upper() for name, value in LEVELS.items()}
+
+
+def format_record(record: tuple) -> str:
+    """One logfmt-style line: time, level, source, event, then key=value fields."""
+    t, level, source, event, fields = record
+    parts = [f"{t:.6f}", f"{_LEVEL_NAMES.get(level, level):<7}", source, event]
+    parts.extend(f"{key}={value}" for key, value in fields.items())
+    return " ".join(parts) + "\n"
+
+
+class EventLog:
+    """
+    Leveled, structured event log for the protocol endpoints. An event is a
+    source ("gbn.sender"), a name ("send") and keyword fields, and is only
+    formatted once it has passed the level check. Per-packet events are DEBUG,
+    so with the default level they cost a single comparison: hot-path callers
+    test `events.level <= DEBUG` before building the call at all.
+
+    Enabled events are written to `stream` (stdout if None, looked up at write
+    time) or, with `ring_size`, kept as raw records in a ring buffer of the most
+    recent events, formatted only when dump() is called.
+    """
+
+    def __init__(
+        self,
+        level: int = WARNING,
+        stream: Optional[TextIO] = None,
+        ring_size: int = 0,
+        clock=None,
+    ):
+        self.level = level
+        self.stream = stream
+        self.ring = collections.deque(maxlen=ring_size) if ring_size else None
+        self.clock = clock
+        self.lock = threading.Lock()
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def log(self, level: int, source: str, event: str, **fields):
+        if level < self.level:
+            return
+        record = (
+            self.clock.now() if self.clock else time.monotonic(),
+            level,
+            source,
+            event,
+            fields,
+        )
+        with self.lock:
+            if self.ring is not None:
+                self.ring.append(record)
+            else:
+                (self.stream or sys.stdout).write(format_record(record))
+
+    def debug(self, source: str, event: str, **fields):
+        self.log(DEBUG, source, event, **fields)
+
+    def info(self, source: str, event: str, **fields):
+        self.log(INFO, source, event, **fields)
+
+    def warning(self, source: str, event: str, **fields):
+        self.log(WARNING, source, event, **fields)
+
+    def error(self, source: str, event: str, **fields):
+        self.log(ERROR, source, event, **fields)
+
+    def dump(self, stream: Optional[TextIO] = None):
+        """Writes out and clears the ring buffer (to `stream`, else the log's own)."""
+        if self.ring is None:
+            return
+        with self.lock:
+            records = list(self.ring)
+            self.ring.clear()
+        out = stream or self.stream or sys.stdout
+        out.writelines(map(format_record, records))
+
+
+# Used by channels created without their own log: warnings and errors to stdout
+DEFAULT_EVENTS = EventLog()
@@ -0,0 +1,239 @@
+import os
+import struct
+import threading
+from typing import Optional
+
+from src.clock import REAL_CLOCK
+from src.packet import Packet
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; only reading traces needs it
+    np = None
+
+# Event kinds
+SENT = 0
+LOST = 1
+CORRUPTED = 2
+DELIVERED = 3
+DELIVERED_CORRUPT = 4  # Delivered, but failing its checksum
+KIND_NAMES = ("sent", "lost", "corrupted", "delivered", "delivered_corrupt")
+
+# Directions
+DATA = 0
+ACK = 1
+
+MAGIC = b"RDTEVT1\n"
+_HEADER = struct.Struct("<8sI4x")  # magic, record size
+# time, kind, direction, packet flags, seq, ack, payload length, channel delay
+_RECORD = struct.Struct("<dBBHIIIf4x")
+
+if np is not None:
+    RECORD_DTYPE = np.dtype(
+        {
+            "names": [
+                "time",
+                "kind",
+                "direction",
+                "flags",
+                "seq",
+                "ack",
+                "length",
+                "delay",
+            ],
+            "formats": ["<f8", "u1", "u1", "<u2", "<u4", "<u4", "<u4", "<f4"],
+            "offsets": [0, 8, 9, 10, 12, 16, 20, 24],
+            "itemsize": _RECORD.size,
+        }
+    )
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Reading event traces requires NumPy")
+
+
+class TraceRecorder:
+    """
+    Channel observer that appends one fixed-size binary record per event
+    (sent, lost, corrupted, delivered) to a trace file. Records are packed into
+    an in-memory block and written a block at a time; call close() (or use it
+    as a context manager) to flush the rest. Timestamps come from `clock`, so a
+    virtual-clock run records simulated time. Safe to share between channels.
+    """
+
+    def __init__(self, path: str, clock=None, block_records: int = 4096):
+        self.clock = clock or REAL_CLOCK
+        self.file = open(path, "wb")
+        self.file.write(_HEADER.pack(MAGIC, _RECORD.size))
+        self.records = 0
+        self._block = bytearray(_RECORD.size * block_records)
+        self._offset = 0
+        self.lock = threading.Lock()
+
+    def _record(self, kind: int, packet: Packet, delay: float = 0.0):
+        flags = packet.flags
+        now = self.clock.now()
+        with self.lock:
+            if self.file is None:
+                return
+            _RECORD.pack_into(
+                self._block,
+                self._offset,
+                now,
+                kind,
+                ACK if flags & Packet.ACK else DATA,
+                flags,
+                packet.seq_num & 0xFFFFFFFF,
+                packet.ack_num & 0xFFFFFFFF,
+                len(packet.payload),
+                delay,
+            )
+            self._offset += _RECORD.size
+            self.records += 1
+            if self._offset == len(self._block):
+                self.file.write(self._block)
+                self._offset = 0
+
+    def packet_sent(self, packet: Packet, delay: float):
+        self._record(SENT, packet, delay)
+
+    def packet_lost(self, packet: Packet):
+        self._record(LOST, packet)
+
+    def packet_corrupted(self, packet: Packet):
+        self._record(CORRUPTED, packet)
+
+    def packet_delivered(self, packet: Packet):
+        self._record(DELIVERED_CORRUPT if packet.is_corrupt() else DELIVERED, packet)
+
+    def log(self, message: str):
+        pass
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(memoryview(self._block)[: self._offset])
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_trace(path: str):
+    """
+    Memory-maps a trace written by TraceRecorder as a read-only NumPy structured
+    array (fields as in RECORD_DTYPE). A partly written last record is ignored.
+    """
+    _require_numpy()
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size or header[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path}: not an event trace")
+    _, record_size = _HEADER.unpack(header)
+    if record_size != _RECORD.size:
+        raise ValueError(f"{path}: unsupported record size {record_size}")
+    count = (os.path.getsize(path) - _HEADER.size) // record_size
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(
+        path, dtype=RECORD_DTYPE, mode="r", offset=_HEADER.size, shape=(count,)
+    )
+
+
+def _percentiles(values) -> dict:
+    if not len(values):
+        return {}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99]).tolist()
+    return {
+        "mean": float(values.mean()),
+        "p50": p50,
+        "p90": p90,
+        "p99": p99,
+        "max": float(values.max()),
+    }
+
+
+def trace_stats(events, interval: Optional[float] = None, bins: int = 20) -> dict:
+    """
+    Summarizes a trace array:
+    - event counts per kind and direction
+    - the retransmission ratio: data transmissions beyond the first of each
+      sequence number, over all data transmissions
+    - goodput over time, in `interval`-second bins (default: `bins` bins).
+      Each data segment counts once, at its first intact delivery.
+    - per-packet latency, from a segment's first transmission to its first
+      intact delivery, which includes any retransmission rounds
+    - the one-way channel delay of each data transmission
+    Sequence numbers are assumed not to wrap within the trace.
+    """
+    _require_numpy()
+    times = events["time"]
+    if len(times) > 1 and (np.diff(times) < 0).any():
+        # Threads of a real-clock run may interleave their records slightly
+        events = events[np.argsort(times, kind="stable")]
+        times = events["time"]
+
+    kind = events["kind"]
+    data = events["direction"] == DATA
+    counts = {
+        direction: {
+            name: int(np.count_nonzero((kind == k) & selector))
+            for k, name in enumerate(KIND_NAMES)
+        }
+        for direction, selector in (("data", data), ("ack", ~data))
+    }
+
+    sent = events[data & (kind == SENT)]
+    delivered = events[data & (kind == DELIVERED)]
+    # np.unique returns the index of each value's first occurrence, i.e. its earliest
+    sent_seqs, first_sent = np.unique(sent["seq"], return_index=True)
+    delivered_seqs, first_delivered = np.unique(delivered["seq"], return_index=True)
+    retransmission_ratio = 1 - len(sent_seqs) / len(sent) if len(sent) else 0.0
+
+    start = float(times[0]) if len(times) else 0.0
+    end = float(times[-1]) if len(times) else 0.0
+    span = end - start
+    if interval is None or interval <= 0:
+        interval = span / bins if span > 0 else 1.0
+    edges = np.arange(start, end + interval, interval)
+    if len(edges) < 2:
+        edges = np.array([start, start + interval])
+    delivered_bytes, _ = np.histogram(
+        delivered["time"][first_delivered],
+        bins=edges,
+        weights=delivered["length"][first_delivered],
+    )
+
+    _, sent_at, delivered_at = np.intersect1d(
+        sent_seqs, delivered_seqs, assume_unique=True, return_indices=True
+    )
+    latency = (
+        delivered["time"][first_delivered[delivered_at]]
+        - sent["time"][first_sent[sent_at]]
+    )
+
+    return {
+        "events": int(len(events)),
+        "duration": span,
+        "counts": counts,
+        "segments": int(len(sent_seqs)),
+        "segments_delivered": int(len(delivered_seqs)),
+        "retransmission_ratio": retransmission_ratio,
+        "goodput": (
+            float(delivered["length"][first_delivered].sum()) / span
+            if span > 0
+            else 0.0
+        ),
+        "interval": interval,
+        "goodput_series": list(
+            zip((edges[:-1] - start).tolist(), (delivered_bytes / interval).tolist())
+        ),
+        "latency": _percentiles(latency),
+        "channel_delay": _percentiles(sent["delay"].astype(np.float64)),
+    }
@@ -1,6 +1,6 @@
-import time
 import threading
-from typing import List
+from typing import List, Optional
+from src.eventlog import DEBUG
 from src.packet import Packet
 from src.rdt_base import RDTSender, RDTReceiver
 from src.channel import UnreliableChannel
@@ -18,59 +18,95 @@ class GBNSender(RDTSender):
         window_size: int = 4,
         timeout: float = 1.0,
         observer=None,
+        segment_size: int = 1024,
+        seq_bits: int = 32,
+        rto: str = "fixed",
+        congestion: str = "none",
+        dup_ack_threshold: int = 3,
     ):
-        super().__init__(channel, receiver_queue, observer)
-        self.window_size = window_size
-        self.timeout = timeout
+        super().__init__(
+            channel,
+            receiver_queue,
+            observer,
+            segment_size,
+            seq_bits,
+            timeout,
+            rto,
+            congestion,
+        )
+        self.seq_space.check_window(window_size, selective=False)
+        self._init_window(window_size)
+        # Duplicate ACKs of base that trigger a go-back before the timer; 0 disables
+        self.dup_ack_threshold = dup_ack_threshold
+        self.dup_acks = 0
+        # base and next_seq_num wrap around the sequence space
         self.base = 0
         self.next_seq_num = 0
-        self.packets: List[Packet] = []  # Buffer to store all packets created from data
+        # Unacknowledged packets in a ring indexed by seq_num & ring_mask;
+        # slots are cleared as base advances
+        ring_size = self.seq_space.ring_size(window_size)
+        self.ring_mask = ring_size - 1
+        self.packets: List[Optional[Packet]] = [None] * ring_size
+        # First-transmission times for RTT sampling; None once retransmitted
+        self.sent_at: List[Optional[float]] = [None] * ring_size
         self.timer = None
         self.lock = threading.Lock()
+        # Signalled whenever base advances, so the send loop can refill the window
+        self.window_open = threading.Condition(self.lock)
 
-    def send_data(self, data: bytes):
+    def send_data(self, data):
         """
-        Divides data into packets and starts sending.
+        Starts sending data; packets are created only as the window advances.
         For simplicity, we assume this is called once with all data.
         """
-        # Packetize data
-        chunk_size = 1024
-        for i in range(0, len(data), chunk_size):
-            chunk = data[i : i + chunk_size]
-            packet = Packet(
-                seq_num=len(self.packets), ack_num=0, flags=0, payload=chunk
-            )
-            self.packets.append(packet)
+        self._open_source(data)
+
+        if self.clock.virtual:
+            # No sending thread: the window is refilled as ACKs arrive
+            with self.lock:
+                self._fill_window()
+            return
 
         # Start sending loop
         threading.Thread(target=self._send_window, daemon=True).start()
 
     def _send_window(self):
-        while self.running and self.base < len(self.packets):
-            with self.lock:
-                # Send packets within window
-                while (
-                    self.running
-                    and self.next_seq_num < self.base + self.window_size
-                    and self.next_seq_num < len(self.packets)
-                ):
-                    packet = self.packets[self.next_seq_num]
-                    print(f"Sender: Sending packet {packet.seq_num}")
-                    self.channel.send(packet, self.receiver_queue)
-
-                    if self.base == self.next_seq_num:
-                        self._start_timer()
+        with self.window_open:
+            while self.running and not self.is_finished():
+                self._fill_window()
+                # Sleep until an ACK moves the window (or stop() is called)
+                self.window_open.wait()
+
+    def _fill_window(self):
+        """Sends packets within window. Caller must hold self.lock."""
+        seq_space = self.seq_space
+        while (
+            self.running
+            and seq_space.diff(self.next_seq_num, self.base) < self._window()
+        ):
+            payload = self._next_payload()
+            if payload is None:
+                break
+            packet = Packet(
+                seq_num=self.next_seq_num, ack_num=0, flags=0, payload=payload
+            )
+            self.packets[self.next_seq_num & self.ring_mask] = packet
+            self.sent_at[self.next_seq_num & self.ring_mask] = self.clock.now()
+            if self.events.level <= DEBUG:
+                self.events.debug("gbn.sender", "send", seq=packet.seq_num)
+            self.metrics.inc("sender.packets_sent")
+            self.channel.send(packet, self.receiver_queue)
 
-                    self.next_seq_num += 1
+            if self.base == self.next_seq_num:
+                self._start_timer()
 
-            time.sleep(0.01)  # Yield to prevent busy waiting
+            self.next_seq_num = seq_space.add(self.next_seq_num, 1)
 
     def _start_timer(self):
         if self.timer:
             self.timer.cancel()
         if self.running:
-            self.timer = threading.Timer(self.timeout, self._timeout_handler)
-            self.timer.start()
+            self.timer = self.clock.call_later(self.rtt.rto, self._timeout_handler)
 
     def _stop_timer(self):
         if self.timer:
@@ -82,33 +118,83 @@ class GBNSender(RDTSender):
             return
 
         with self.lock:
-            print(f"Sender: Timeout! Retransmitting from {self.base}")
-            self._start_timer()
-            # Retransmit all packets in window
-            for i in range(self.base, self.next_seq_num):
-                if not self.running:
-                    break
-                print(f"Sender: Retransmitting packet {self.packets[i].seq_num}")
-                self.channel.send(self.packets[i], self.receiver_queue)
+            self.events.info("gbn.sender", "timeout", base=self.base, rto=self.rtt.rto)
+            self.metrics.inc("sender.timeouts")
+            self.rtt.backoff()
+            self._congestion_event(self.base, timeout=True)
+            self.timeout_retransmissions += self._go_back()
+
+    def _go_back(self) -> int:
+        """
+        Restarts the timer and retransmits every packet in the window.
+        Caller must hold self.lock. Returns how many packets were resent.
+        """
+        self._start_timer()
+        resent = 0
+        for i in range(self.seq_space.diff(self.next_seq_num, self.base)):
+            if not self.running:
+                break
+            index = (self.base + i) & self.ring_mask
+            packet = self.packets[index]
+            self.sent_at[index] = None
+            if self.events.level <= DEBUG:
+                self.events.debug("gbn.sender", "retransmit", seq=packet.seq_num)
+            self.retransmissions += 1
+            self.metrics.inc("sender.packets_sent")
+            self.metrics.inc("sender.retransmissions")
+            resent += 1
+            self.channel.send(packet, self.receiver_queue)
+        return resent
 
     def process_ack(self, packet: Packet):
         if packet.is_corrupt():
-            print("Sender: Received corrupt ACK")
+            if self.events.level <= DEBUG:
+                self.events.debug("gbn.sender", "ack_corrupt")
+            self.metrics.inc("sender.acks_corrupt")
             return
 
         with self.lock:
-            print(f"Sender: Received ACK {packet.ack_num}")
+            if self.events.level <= DEBUG:
+                self.events.debug(
+                    "gbn.sender", "ack", ack=packet.ack_num, base=self.base
+                )
+            self.metrics.inc("sender.acks_received")
             # Cumulative ACK: ack_num is the next expected seq_num
             # So if we get ack_num, it means everything before ack_num is received.
-            if packet.ack_num > self.base:
+            acked = self.seq_space.diff(packet.ack_num, self.base)
+            if 0 < acked <= self.seq_space.diff(self.next_seq_num, self.base):
+                # Time the newest segment this ACK covers
+                self._on_new_ack(self.sent_at[(packet.ack_num - 1) & self.ring_mask])
+                for i in range(acked):
+                    self.packets[(self.base + i) & self.ring_mask] = None
+                    self.sent_at[(self.base + i) & self.ring_mask] = None
                 self.base = packet.ack_num
+                self.dup_acks = 0
+                if self.cc:
+                    self.cc.on_ack(acked)
                 self._stop_timer()
-                if self.base < self.next_seq_num:
+                if self.base != self.next_seq_num:
                     self._start_timer()
+                if self.clock.virtual:
+                    self._fill_window()
+                else:
+                    self.window_open.notify()
+                self._record_window()
+            elif packet.ack_num == self.base and self.base != self.next_seq_num:
+                # Duplicate: the receiver is still waiting for base
+                self.metrics.inc("sender.acks_duplicate")
+                self.dup_acks += 1
+                if self.dup_acks == self.dup_ack_threshold:
+                    self.events.info("gbn.sender", "fast_retransmit", base=self.base)
+                    self.metrics.inc("sender.fast_retransmits")
+                    self._congestion_event(self.base, timeout=False)
+                    self.fast_retransmissions += self._go_back()
 
     def stop(self):
         super().stop()
-        self._stop_timer()
+        with self.lock:
+            self._stop_timer()
+            self.window_open.notify()
 
 
 class GBNReceiver(RDTReceiver):
@@ -116,28 +202,46 @@ class GBNReceiver(RDTReceiver):
     Go-Back-N Receiver.
     """
 
-    def __init__(self, channel: UnreliableChannel, sender_queue, observer=None):
-        super().__init__(channel, sender_queue, observer)
+    def __init__(
+        self,
+        channel: UnreliableChannel,
+        sender_queue,
+        observer=None,
+        seq_bits: int = 32,
+    ):
+        super().__init__(channel, sender_queue, observer, seq_bits)
         self.expected_seq_num = 0
 
     def receive_packet(self, packet: Packet):
         if packet.is_corrupt():
-            print("Receiver: Received corrupt packet")
+            if self.events.level <= DEBUG:
+                self.events.debug("gbn.receiver", "corrupt")
+            self.metrics.inc("receiver.packets_corrupt")
             # Send ACK for last correctly received packet (expected_seq_num - 1)
             # But if expected_seq_num is 0, we can't ack -1.
             # In GBN, we usually just re-send the last ACK.
             self._send_ack(self.expected_seq_num)
             return
 
-        print(f"Receiver: Received packet {packet.seq_num}")
+        if self.events.level <= DEBUG:
+            self.events.debug("gbn.receiver", "receive", seq=packet.seq_num)
+        self.metrics.inc("receiver.packets_received")
         if packet.seq_num == self.expected_seq_num:
-            self.received_data.append(packet.payload)
-            self.expected_seq_num += 1
+            self._deliver_data(packet.payload)
+            self.expected_seq_num = self.seq_space.add(self.expected_seq_num, 1)
             self._send_ack(self.expected_seq_num)
         else:
-            print(f"Receiver: Out of order packet {packet.seq_num}, expected {self.expected_seq_num}")
+            if self.events.level <= DEBUG:
+                self.events.debug(
+                    "gbn.receiver",
+                    "out_of_order",
+                    seq=packet.seq_num,
+                    expected=self.expected_seq_num,
+                )
+            self.metrics.inc("receiver.packets_out_of_order")
             self._send_ack(self.expected_seq_num)
 
     def _send_ack(self, ack_num: int):
-        ack_packet = Packet(seq_num=0, ack_num=ack_num, flags=Packet.ACK)
-        self.channel.send(ack_packet, self.sender_queue)
+        self.acks_sent += 1
+        self.metrics.inc("receiver.acks_sent")
+        self.channel.send(Packet.ack(ack_num), self.sender_queue)
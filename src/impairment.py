@@ -0,0 +1,162 @@
+import random
+import threading
+from typing import Dict, Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; only schedules (and trace reading) need it
+    np = None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Precomputed impairment schedules require NumPy")
+
+
+class ImpairmentSchedule:
+    """
+    Precomputed impairment decisions for the transmissions through one channel.
+    Decisions are generated with NumPy a block at a time: loss and corruption
+    masks, delay samples (jitter plus reorder offsets), and the points used to
+    place a loss or a bit flip. `next()` hands them out in order, with the same
+    meaning as UnreliableChannel._draw.
+
+    Block k always comes from generator seed (seed, k), so the schedule is a
+    pure function of its rates and seed. A saved schedule replays its stored
+    entries and then carries on generating the same blocks it would have.
+    """
+
+    FIELDS = ("delay", "lost", "loss_point", "corrupt", "corrupt_point")
+    PARAMS = (
+        "loss_rate",
+        "corruption_rate",
+        "avg_delay",
+        "reorder_rate",
+        "seed",
+        "block_size",
+    )
+
+    def __init__(
+        self,
+        loss_rate: float = 0.0,
+        corruption_rate: float = 0.0,
+        avg_delay: float = 0.0,
+        reorder_rate: float = 0.0,
+        seed: Optional[int] = None,
+        block_size: int = 4096,
+    ):
+        _require_numpy()
+        self.loss_rate = loss_rate
+        self.corruption_rate = corruption_rate
+        self.avg_delay = avg_delay
+        self.reorder_rate = reorder_rate
+        # Pin a seed even when none is given so the schedule can be exported
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(63)
+        self.block_size = block_size
+        self.position = 0  # Entries handed out so far
+
+        self._recorded = None  # Columns loaded from a file, replayed first
+        self._block_index = -1
+        self._block = []
+        self.lock = threading.Lock()
+
+    def _generate_columns(self, block_index: int) -> dict:
+        gen = np.random.default_rng([self.seed, block_index])
+        n = self.block_size
+        jitter = gen.uniform(-0.5, 0.5, n)
+        reorder = gen.random(n) < self.reorder_rate
+        reorder_delay = gen.uniform(0.1, 0.5, n)
+        lost = gen.random(n) < self.loss_rate
+        loss_point = gen.uniform(0.2, 0.8, n)
+        corrupt = gen.random(n) < self.corruption_rate
+        corrupt_point = gen.random(n)
+
+        # Base delay: average +/- 50%, plus the reorder offset where drawn
+        delay = self.avg_delay * (1 + jitter) if self.avg_delay > 0 else np.zeros(n)
+        delay = delay + np.where(reorder, reorder_delay, 0.0)
+        return {
+            "delay": delay,
+            "lost": lost,
+            "loss_point": loss_point,
+            "corrupt": corrupt,
+            "corrupt_point": corrupt_point,
+        }
+
+    def _block_columns(self, block_index: int) -> dict:
+        columns = self._generate_columns(block_index)
+        if self._recorded is not None:
+            # Overlay whatever part of this block was recorded
+            start = block_index * self.block_size
+            recorded_len = len(self._recorded["delay"])
+            if start < recorded_len:
+                end = min(start + self.block_size, recorded_len)
+                for name in self.FIELDS:
+                    columns[name][: end - start] = self._recorded[name][start:end]
+        return columns
+
+    def _load_block(self, block_index: int):
+        columns = self._block_columns(block_index)
+        # Plain Python tuples make each next() a single list lookup
+        self._block = list(zip(*(columns[name].tolist() for name in self.FIELDS)))
+        self._block_index = block_index
+
+    def next(self) -> tuple:
+        """
+        Returns (delay, lost, loss_point, corrupt, corrupt_point) for the next
+        transmission.
+        """
+        with self.lock:
+            block_index, offset = divmod(self.position, self.block_size)
+            if block_index != self._block_index:
+                self._load_block(block_index)
+            self.position += 1
+            return self._block[offset]
+
+    def columns(self, count: int) -> dict:
+        """The first `count` decisions as NumPy arrays, independent of consumption."""
+        blocks = [self._block_columns(i) for i in range(-(-count // self.block_size))]
+        blocks = blocks or [{name: np.zeros(0) for name in self.FIELDS}]
+        return {
+            name: np.concatenate([block[name] for block in blocks])[:count]
+            for name in self.FIELDS
+        }
+
+    def params(self) -> dict:
+        return {key: getattr(self, key) for key in self.PARAMS}
+
+
+def save_schedules(
+    path: str, schedules: Dict[str, ImpairmentSchedule], count: Optional[int] = None
+):
+    """
+    Writes named schedules (e.g. "forward", "backward") to one .npz file.
+    Each is stored up to `count` entries, or as far as it has been consumed.
+    """
+    _require_numpy()
+    arrays = {}
+    for name, schedule in schedules.items():
+        columns = schedule.columns(schedule.position if count is None else count)
+        for field, values in columns.items():
+            arrays[f"{name}.{field}"] = values
+        for key, value in schedule.params().items():
+            arrays[f"{name}.param.{key}"] = np.array(value)
+    np.savez_compressed(path, **arrays)
+
+
+def load_schedules(path: str) -> Dict[str, ImpairmentSchedule]:
+    """Reads schedules written by save_schedules; each replays from its first entry."""
+    _require_numpy()
+    schedules = {}
+    with np.load(path) as data:
+        names = {key.split(".", 1)[0] for key in data.files}
+        for name in sorted(names):
+            params = {
+                key: data[f"{name}.param.{key}"].item()
+                for key in ImpairmentSchedule.PARAMS
+            }
+            schedule = ImpairmentSchedule(**params)
+            schedule._recorded = {
+                field: data[f"{name}.{field}"] for field in ImpairmentSchedule.FIELDS
+            }
+            schedules[name] = schedule
+    return schedules
@@ -0,0 +1,183 @@
+import bisect
+import json
+import threading
+from typing import Optional
+
+# Latency bucket upper bounds in seconds: 0.5 ms doubling up to ~33 s
+LATENCY_BUCKETS = tuple(0.0005 * 2**i for i in range(17))
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts[i] holds values <= bounds[i], last overflows."""
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def merge(self, other: "Histogram"):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.total += other.total
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the q-quantile's bucket (None if empty or overflowed)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "bounds": list(self.bounds),
+            "counts": list(self.counts),
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class TimeSeries:
+    """
+    (time, value) samples bounded to about `max_points`: once full, every other
+    point is dropped and only every second later sample is kept, so memory stays
+    fixed while the whole run remains covered.
+    """
+
+    __slots__ = ("points", "max_points", "stride", "_skipped")
+
+    def __init__(self, max_points: int = 2000):
+        self.points = []
+        self.max_points = max_points
+        self.stride = 1
+        self._skipped = 0
+
+    def append(self, t: float, value: float):
+        self._skipped += 1
+        if self._skipped < self.stride:
+            return
+        self._skipped = 0
+        self.points.append((t, value))
+        if len(self.points) >= self.max_points:
+            del self.points[1::2]
+            self.stride *= 2
+
+
+class _Shard:
+    """One thread's private counters, histograms and series: updated without locks."""
+
+    __slots__ = ("counters", "histograms", "series")
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.series = {}
+
+
+class Metrics:
+    """
+    Counters, latency histograms and time series shared by a run's senders,
+    receivers and channels. Each thread records into its own shard, so the hot
+    path takes no lock; readers merge the shards when exporting, which may be
+    done at any time, including while the run is in progress.
+    """
+
+    enabled = True
+
+    def __init__(self, clock=None):
+        self.clock = clock
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def inc(self, name: str, n: int = 1):
+        counters = self._shard().counters
+        counters[name] = counters.get(name, 0) + n
+
+    def observe(self, name: str, value: float):
+        histograms = self._shard().histograms
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def sample(self, name: str, value: float):
+        series = self._shard().series
+        ts = series.get(name)
+        if ts is None:
+            ts = series[name] = TimeSeries()
+        ts.append(self.clock.now() if self.clock else 0.0, value)
+
+    def snapshot(self) -> dict:
+        """Merged view of every shard, as plain JSON-ready data."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        counters, histograms, series = {}, {}, {}
+        for shard in shards:
+            # Copies are taken in one C call each, so a writer can't resize them
+            # mid-read
+            for name, n in dict(shard.counters).items():
+                counters[name] = counters.get(name, 0) + n
+            for name, histogram in dict(shard.histograms).items():
+                merged = histograms.get(name)
+                if merged is None:
+                    merged = histograms[name] = Histogram(histogram.bounds)
+                merged.merge(histogram)
+            for name, ts in dict(shard.series).items():
+                series.setdefault(name, []).extend(list(ts.points))
+        return {
+            "time": self.clock.now() if self.clock else None,
+            "counters": dict(sorted(counters.items())),
+            "histograms": {name: h.to_dict() for name, h in sorted(histograms.items())},
+            "series": {name: sorted(points) for name, points in sorted(series.items())},
+        }
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        """Returns the snapshot as JSON, also writing it to `path` if given."""
+        text = json.dumps(self.snapshot(), indent=2)
+        if path:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+
+class _NullMetrics:
+    """Stand-in when no metrics are collected: every call is a no-op."""
+
+    enabled = False
+
+    def inc(self, name: str, n: int = 1):
+        pass
+
+    def observe(self, name: str, value: float):
+        pass
+
+    def sample(self, name: str, value: float):
+        pass
+
+
+NULL_METRICS = _NullMetrics()
@@ -1,7 +1,12 @@
 import struct
 import json
+import zlib
 from typing import Optional
-from src.utils import calculate_checksum
+
+# Header fields covered by the checksum: seq_num, ack_num, flags
+_CHECKSUM_HEADER = struct.Struct("!III")
+# Wire header: Seq(4), Ack(4), Flags(4), Checksum(4), Payload_Len(4)
+_WIRE_HEADER = struct.Struct("!IIIII")
 
 
 class Packet:
@@ -15,9 +20,21 @@ class Packet:
     - checksum (int): Checksum for error detection
     """
 
+    __slots__ = ("seq_num", "ack_num", "flags", "payload", "checksum")
+
     SYN = 0b001
     ACK = 0b010
     FIN = 0b100
+    # Selective ACK: ack_num is cumulative (next expected seq_num) and the payload
+    # is a little-endian bitmap whose bit i means ack_num + 1 + i was received
+    SACK = 0b1000
+
+    HEADER_SIZE = _WIRE_HEADER.size
+
+    # Prebuilt ACK packets keyed by ack_num. Safe to share: the channel never
+    # mutates packets.
+    _ack_cache = {}
+    _ACK_CACHE_LIMIT = 4096
 
     def __init__(
         self,
@@ -36,37 +53,79 @@ class Packet:
         else:
             self.checksum = checksum
 
+    @classmethod
+    def ack(cls, ack_num: int) -> "Packet":
+        """Returns a (cached) ACK packet for ack_num."""
+        packet = cls._ack_cache.get(ack_num)
+        if packet is None:
+            if len(cls._ack_cache) >= cls._ACK_CACHE_LIMIT:
+                cls._ack_cache.clear()
+            packet = cls(seq_num=0, ack_num=ack_num, flags=cls.ACK)
+            cls._ack_cache[ack_num] = packet
+        return packet
+
+    @classmethod
+    def sack(cls, ack_num: int, bitmap: int = 0) -> "Packet":
+        """Returns a selective ACK: cumulative ack_num plus a bitmap of later ones."""
+        payload = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+        return cls(
+            seq_num=0, ack_num=ack_num, flags=cls.ACK | cls.SACK, payload=payload
+        )
+
+    def sack_bitmap(self) -> int:
+        """The bitmap of a selective ACK (see SACK)."""
+        return int.from_bytes(self.payload, "little")
+
     def calculate_checksum(self) -> int:
         """Calculates checksum over header fields and payload."""
-        # Pack header fields: seq_num, ack_num, flags
-        # We use a simple packing format.
+        # The CRC runs over the header and then continues over the payload,
+        # so the payload is never copied into a concatenated buffer.
         # Note: checksum field itself is NOT included in checksum calculation.
-        header = struct.pack("!III", self.seq_num, self.ack_num, self.flags)
-        return calculate_checksum(header + self.payload)
+        header = _CHECKSUM_HEADER.pack(self.seq_num, self.ack_num, self.flags)
+        return zlib.crc32(self.payload, zlib.crc32(header)) & 0xFFFFFFFF
 
     def is_corrupt(self) -> bool:
         """Checks if the packet is corrupt."""
         return self.calculate_checksum() != self.checksum
 
+    def wire_size(self) -> int:
+        """Number of bytes to_bytes/pack_into produce."""
+        return _WIRE_HEADER.size + len(self.payload)
+
     def to_bytes(self) -> bytes:
         """Serializes the packet to bytes."""
-        # Format: Seq(4), Ack(4), Flags(4), Checksum(4), Payload_Len(4), Payload(...)
-        payload_len = len(self.payload)
-        header = struct.pack(
-            "!IIIII", self.seq_num, self.ack_num, self.flags, self.checksum, payload_len
+        header = _WIRE_HEADER.pack(
+            self.seq_num, self.ack_num, self.flags, self.checksum, len(self.payload)
         )
         return header + self.payload
 
+    def pack_into(self, buffer, offset: int = 0) -> int:
+        """Serializes the packet into a preallocated buffer. Returns bytes written."""
+        payload_len = len(self.payload)
+        _WIRE_HEADER.pack_into(
+            buffer,
+            offset,
+            self.seq_num,
+            self.ack_num,
+            self.flags,
+            self.checksum,
+            payload_len,
+        )
+        start = offset + _WIRE_HEADER.size
+        buffer[start : start + payload_len] = self.payload
+        return _WIRE_HEADER.size + payload_len
+
     @classmethod
-    def from_bytes(cls, data: bytes) -> "Packet":
-        """Deserializes a packet from bytes."""
-        if len(data) < 20:  # 5 * 4 bytes
+    def from_bytes(cls, data: bytes, offset: int = 0) -> "Packet":
+        """Deserializes a packet from bytes (or any buffer, starting at offset)."""
+        if len(data) - offset < _WIRE_HEADER.size:
             raise ValueError("Data too short to be a packet")
 
-        seq_num, ack_num, flags, checksum, payload_len = struct.unpack(
-            "!IIIII", data[:20]
+        seq_num, ack_num, flags, checksum, payload_len = _WIRE_HEADER.unpack_from(
+            data, offset
         )
-        payload = data[20 : 20 + payload_len]
+        start = offset + _WIRE_HEADER.size
+        payload = bytes(data[start : start + payload_len])
 
         return cls(seq_num, ack_num, flags, payload, checksum)
 
@@ -1,8 +1,17 @@
 from abc import ABC, abstractmethod
+import hashlib
 import queue
 import threading
 from src.packet import Packet
 from src.channel import UnreliableChannel
+from src.reassembly import ReassemblyBuffer
+from src.utils import segment_stream
+from src.seqnum import SequenceSpace
+from src.rto import RTOEstimator
+from src.congestion import AIMDController
+
+# Put on an endpoint's queue by stop() to wake its blocked listener thread
+SHUTDOWN = object()
 
 
 class RDTSender(ABC):
@@ -11,42 +20,149 @@ class RDTSender(ABC):
     """
 
     def __init__(
-        self, channel: UnreliableChannel, receiver_queue: queue.Queue, observer=None
+        self,
+        channel: UnreliableChannel,
+        receiver_queue: queue.Queue,
+        observer=None,
+        segment_size: int = 1024,
+        seq_bits: int = 32,
+        timeout: float = 1.0,
+        rto: str = "fixed",
+        congestion: str = "none",
     ):
         self.channel = channel
         self.receiver_queue = receiver_queue
-        self.sender_queue = queue.Queue()  # Queue for ACKs coming back from receiver
+        self.segment_size = segment_size
+        self.seq_space = SequenceSpace(seq_bits)
+        self.seq_space.check_channel(channel)
+        if rto not in RTOEstimator.MODES:
+            raise ValueError(f"Unknown RTO mode: {rto}")
+        # "fixed" retransmits after `timeout`; "adaptive" starts there and tracks
+        # the RTT
+        self.timeout = timeout
+        self.rtt = RTOEstimator(timeout, adaptive=rto == "adaptive")
+        if congestion not in AIMDController.MODES:
+            raise ValueError(f"Unknown congestion control: {congestion}")
+        self.congestion = congestion
+        self.cc = None  # AIMDController once the subclass knows its window_size
+        # next_seq_num when cwnd was last cut: losses below it are the same episode
+        self._recovery_point = None
+        # Packetization is lazy: segments are pulled from here as the window advances
+        self._segments = iter(())
+        self.data_exhausted = False
+        self.metrics = channel.metrics
+        self.events = channel.events
+        self.retransmissions = 0  # All retransmitted packets, of which:
+        self.timeout_retransmissions = 0  # sent because a timer expired
+        self.fast_retransmissions = 0  # sent on duplicate ACKs
+        self.clock = channel.clock
+        # Queue for ACKs coming back from receiver
+        self.sender_queue = self.clock.inbox(self.process_ack)
         self.running = True
         self.observer = observer
 
     @abstractmethod
-    def send_data(self, data: bytes):
-        """Called by the application layer to send data."""
+    def send_data(self, data):
+        """
+        Called by the application layer to send data: bytes, a file-like
+        object or an iterable of byte chunks.
+        """
         pass
 
+    def _open_source(self, data):
+        self._segments = segment_stream(data, self.segment_size)
+        self.data_exhausted = False
+
+    def _next_payload(self):
+        """Returns the next segment to packetize, or None once the data runs out."""
+        payload = next(self._segments, None)
+        if payload is None:
+            self.data_exhausted = True
+        return payload
+
     @abstractmethod
     def process_ack(self, packet: Packet):
         """Process incoming ACK packets."""
         pass
 
+    def _on_new_ack(self, sent_at):
+        """
+        Called when an ACK acknowledges new data: clears any timeout backoff and
+        samples the RTT of the segment sent at `sent_at`.
+        Karn's rule: callers pass None for segments that were retransmitted.
+        """
+        if sent_at is not None:
+            rtt = self.clock.now() - sent_at
+            self.rtt.sample(rtt)
+            self.metrics.observe("sender.rtt", rtt)
+        self.rtt.reset_backoff()
+
+    def _record_window(self):
+        """Samples window occupancy (and cwnd) into the metrics time series."""
+        if self.metrics.enabled:
+            self.metrics.sample(
+                "sender.outstanding", self.seq_space.diff(self.next_seq_num, self.base)
+            )
+            if self.cc:
+                self.metrics.sample("sender.cwnd", self.cc.cwnd)
+
+    def _init_window(self, window_size: int):
+        """
+        Sets the receiver-imposed window and, if enabled, the congestion window
+        under it.
+        """
+        self.window_size = window_size
+        if self.congestion == "aimd":
+            self.cc = AIMDController(window_size, self.clock)
+
+    def _window(self) -> int:
+        """How many packets may be outstanding right now."""
+        return self.cc.window if self.cc else self.window_size
+
+    def _congestion_event(self, seq_num: int, timeout: bool):
+        """
+        Cuts the congestion window for the loss of seq_num, at most once per
+        window of data: losses of packets sent before the last cut are ignored.
+        """
+        if self.cc is None:
+            return
+        if self._recovery_point is not None:
+            ahead = self.seq_space.diff(self._recovery_point, self.base)
+            outstanding = self.seq_space.diff(self.next_seq_num, self.base)
+            if ahead <= outstanding and self.seq_space.diff(seq_num, self.base) < ahead:
+                return
+        self._recovery_point = self.next_seq_num
+        self.metrics.inc("sender.window_cuts")
+        if timeout:
+            self.cc.on_timeout()
+        else:
+            self.cc.on_loss()
+
+    def is_finished(self) -> bool:
+        """True once every segment of the data has been sent and acknowledged."""
+        return self.data_exhausted and self.base == self.next_seq_num
+
     def log(self, message: str):
         if self.observer:
             self.observer.log(f"Sender: {message}")
 
     def start(self):
         """Starts the sender thread to listen for ACKs."""
+        if self.clock.virtual:
+            return  # ACKs are dispatched by the clock's event loop
         threading.Thread(target=self._listen_for_acks, daemon=True).start()
 
     def _listen_for_acks(self):
         while self.running:
-            try:
-                packet = self.sender_queue.get(timeout=0.1)
-                self.process_ack(packet)
-            except queue.Empty:
-                continue
+            packet = self.sender_queue.get()
+            if packet is SHUTDOWN:
+                break
+            self.process_ack(packet)
 
     def stop(self):
         self.running = False
+        if not self.clock.virtual:
+            self.sender_queue.put(SHUTDOWN)
 
 
 class RDTReceiver(ABC):
@@ -55,13 +171,33 @@ class RDTReceiver(ABC):
     """
 
     def __init__(
-        self, channel: UnreliableChannel, sender_queue: queue.Queue, observer=None
+        self,
+        channel: UnreliableChannel,
+        sender_queue: queue.Queue,
+        observer=None,
+        seq_bits: int = 32,
     ):
         self.channel = channel
         self.sender_queue = sender_queue
-        self.receiver_queue = queue.Queue()  # Queue for Data packets coming from sender
+        self.seq_space = SequenceSpace(seq_bits)
+        self.seq_space.check_channel(channel)  # Its ACKs can alias too
+        self.clock = channel.clock
+        self.metrics = channel.metrics
+        self.events = channel.events
+        # Queue for Data packets coming from sender
+        self.receiver_queue = self.clock.inbox(self.receive_packet)
         self.running = True
-        self.received_data = []  # Store received payloads
+        self.received_data = ReassemblyBuffer()  # Store received payloads
+        self.delivered_bytes = 0
+        # Delivered bytes are consumed from the reassembly buffer as they arrive.
+        # Their digest is always kept, and the bytes themselves in kept_data
+        # (first delivered_bytes of it) unless expect(keep_data=False) says not to.
+        self.received_hash = hashlib.sha256()
+        self.kept_data = bytearray()
+        self.acks_sent = 0
+        self.expected_bytes = None
+        self.complete = threading.Event()  # Set once expected_bytes are delivered
+        self.on_complete = None
         self.observer = observer
 
     @abstractmethod
@@ -75,18 +211,86 @@ class RDTReceiver(ABC):
 
     def start(self):
         """Starts the receiver thread to listen for packets."""
+        if self.clock.virtual:
+            return  # Packets are dispatched by the clock's event loop
         threading.Thread(target=self._listen_for_packets, daemon=True).start()
 
     def _listen_for_packets(self):
         while self.running:
-            try:
-                packet = self.receiver_queue.get(timeout=0.1)
-                self.receive_packet(packet)
-            except queue.Empty:
-                continue
+            packet = self.receiver_queue.get()
+            if packet is SHUTDOWN:
+                break
+            self.receive_packet(packet)
+
+    def expect(
+        self, length: int, on_complete=None, keep_data: bool = True
+    ) -> threading.Event:
+        """
+        Arms completion detection: `complete` is set (and `on_complete` called)
+        once `length` bytes have been delivered in order. The delivered bytes are
+        kept, preallocated for `length`, unless `keep_data` is False: then only
+        their digest is, and receiver memory stays bounded by the window.
+        """
+        self.expected_bytes = length
+        self.on_complete = on_complete
+        if not keep_data:
+            self.kept_data = None
+        elif self.kept_data is not None and length > len(self.kept_data):
+            self._grow_kept(length)
+        self._check_complete()
+        return self.complete
+
+    def _deliver_data(self, payload: bytes, offset=None):
+        """
+        Writes a payload into the reassembly buffer at its stream offset
+        (by default, right after the data delivered so far).
+        """
+        if offset is None:
+            offset = self.delivered_bytes
+        if self.received_data.write(offset, payload):
+            data = self.received_data.consume()
+            self.received_hash.update(data)
+            if self.kept_data is not None:
+                end = self.delivered_bytes + len(data)
+                if end > len(self.kept_data):
+                    self._grow_kept(max(end, 2 * len(self.kept_data)))
+                self.kept_data[self.delivered_bytes : end] = data
+            self.delivered_bytes = self.received_data.delivered
+            self._check_complete()
+
+    def _check_complete(self):
+        if (
+            self.expected_bytes is not None
+            and self.delivered_bytes >= self.expected_bytes
+            and not self.complete.is_set()
+        ):
+            self.complete.set()
+            if self.on_complete:
+                self.on_complete()
+
+    def _grow_kept(self, size: int):
+        # A fresh bytearray rather than an in-place resize, which views handed
+        # out by received_view() would block; those keep the old buffer alive.
+        kept = bytearray(size)
+        kept[: self.delivered_bytes] = memoryview(self.kept_data)[
+            : self.delivered_bytes
+        ]
+        self.kept_data = kept
 
     def get_received_data(self) -> bytes:
-        return b"".join(self.received_data)
+        return bytes(self.received_view())
+
+    def received_view(self) -> memoryview:
+        """Zero-copy view of the data delivered so far."""
+        if self.kept_data is None:
+            raise RuntimeError("Received data was not kept: expect(keep_data=False)")
+        return memoryview(self.kept_data)[: self.delivered_bytes]
+
+    def received_digest(self) -> bytes:
+        """SHA-256 of the data delivered so far."""
+        return self.received_hash.digest()
 
     def stop(self):
         self.running = False
+        if not self.clock.virtual:
+            self.receiver_queue.put(SHUTDOWN)
@@ -0,0 +1,91 @@
+import bisect
+
+
+class ReassemblyBuffer:
+    """
+    Byte buffer that payloads are written into at their stream offset.
+    Bytes past the contiguous prefix are tracked as sorted, non-overlapping
+    [start, end) ranges rather than as individual segments. The delivered
+    prefix is handed out by consume(), after which its space is reused, so the
+    buffer only spans unconsumed and out-of-order data (about one window).
+    """
+
+    def __init__(self, capacity: int = 0):
+        self._buf = bytearray(capacity)
+        self.origin = 0  # Stream offset of _buf[0]
+        self.consumed = 0  # Stream offset up to which consume() has returned data
+        self.delivered = 0  # Length of the contiguous prefix starting at offset 0
+        self._starts = []  # Out-of-order ranges beyond `delivered`
+        self._ends = []
+
+    def reserve(self, capacity: int):
+        """Grows the buffer up front so `capacity` unconsumed bytes never reallocate."""
+        if capacity > len(self._buf):
+            self._grow(capacity)
+
+    def _grow(self, size: int):
+        # Copy into a fresh bytearray rather than resizing in place: a bytearray
+        # with exported memoryviews cannot be resized, and old views stay valid.
+        buf = bytearray(size)
+        buf[: len(self._buf)] = self._buf
+        self._buf = buf
+
+    def _make_room(self, end: int):
+        """Moves the unconsumed bytes to the front, growing if `end` still won't fit."""
+        top = max(self.delivered, self._ends[-1] if self._ends else 0)
+        live = self._buf[self.consumed - self.origin : top - self.origin]
+        if end - self.consumed > len(self._buf):
+            self._buf = bytearray(max(end - self.consumed, 2 * len(self._buf)))
+        self._buf[: len(live)] = live
+        self.origin = self.consumed
+
+    def write(self, offset: int, data: bytes) -> int:
+        """
+        Stores `data` at `offset`. Returns how many bytes this added to the
+        contiguous prefix (0 for duplicates or out-of-order data).
+        """
+        end = offset + len(data)
+        if end <= self.delivered or not data:
+            return 0
+        if offset < self.delivered:
+            data = memoryview(data)[self.delivered - offset :]
+            offset = self.delivered
+        if end - self.origin > len(self._buf):
+            self._make_room(end)
+        self._buf[offset - self.origin : end - self.origin] = data
+
+        # Merge [offset, end) with any ranges it touches
+        start = offset
+        i = bisect.bisect_left(self._ends, start)
+        j = bisect.bisect_right(self._starts, end)
+        if i < j:
+            start = min(start, self._starts[i])
+            end = max(end, self._ends[j - 1])
+        self._starts[i:j] = [start]
+        self._ends[i:j] = [end]
+
+        if self._starts[0] > self.delivered:
+            return 0
+        before = self.delivered
+        self.delivered = self._ends[0]
+        del self._starts[0], self._ends[0]
+        return self.delivered - before
+
+    def consume(self) -> memoryview:
+        """
+        Returns the delivered bytes not consumed yet and releases their space.
+        The view is only valid until the next write().
+        """
+        view = memoryview(self._buf)[
+            self.consumed - self.origin : self.delivered - self.origin
+        ]
+        self.consumed = self.delivered
+        return view
+
+    def buffered_bytes(self) -> int:
+        """Bytes held beyond the contiguous prefix, waiting for a gap to fill."""
+        return sum(end - start for start, end in zip(self._starts, self._ends))
+
+    def ranges(self):
+        """Out-of-order byte ranges held beyond the contiguous prefix."""
+        return list(zip(self._starts, self._ends))
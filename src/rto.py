@@ -0,0 +1,65 @@
+class RTOEstimator:
+    """
+    Retransmission timeout from smoothed RTT samples (Jacobson/Karels, RFC 6298):
+    SRTT and RTTVAR are exponentially weighted and RTO = SRTT + 4 * RTTVAR.
+    Each timeout doubles the RTO; the backoff is undone once new data is
+    acknowledged or a valid sample arrives.
+    Callers apply Karn's rule: never sample a segment that was retransmitted.
+    With adaptive=False the RTO stays at `initial_rto`, but samples are still
+    taken so the RTT estimate can be reported.
+    `min_rto` defaults far below RFC 6298's 1 s, since simulated paths are often
+    only milliseconds long.
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+    MODES = ("fixed", "adaptive")
+
+    def __init__(
+        self,
+        initial_rto: float = 1.0,
+        adaptive: bool = True,
+        min_rto: float = 0.01,
+        max_rto: float = 60.0,
+    ):
+        self.initial_rto = initial_rto
+        self.adaptive = adaptive
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.backoffs = 0  # Timeouts seen, in total
+        self._rto = initial_rto  # Before backoff
+        self._shift = 0  # Current backoff exponent
+
+    @property
+    def rto(self) -> float:
+        if not self.adaptive:
+            return self.initial_rto
+        return min(self._rto * (1 << self._shift), self.max_rto)
+
+    def sample(self, rtt: float):
+        """Folds in one RTT measurement (seconds) and recomputes the RTO."""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar += self.BETA * (abs(self.srtt - rtt) - self.rttvar)
+            self.srtt += self.ALPHA * (rtt - self.srtt)
+        self.samples += 1
+        self._rto = min(
+            max(self.srtt + self.K * self.rttvar, self.min_rto), self.max_rto
+        )
+        self._shift = 0
+
+    def backoff(self):
+        """Doubles the RTO after a timeout."""
+        self.backoffs += 1
+        if self._rto * (1 << self._shift) < self.max_rto:
+            self._shift += 1
+
+    def reset_backoff(self):
+        """New data was acknowledged: return to the estimated RTO."""
+        self._shift = 0
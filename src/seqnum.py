@@ -0,0 +1,63 @@
+class SequenceSpace:
+    """
+    A k-bit modular sequence-number space.
+    Sequence numbers wrap to 0 after 2^k - 1, so all comparisons go through
+    `diff`, the forward distance from one number to another.
+    """
+
+    # Packet.seq_num/ack_num are 32-bit header fields
+    MAX_BITS = 32
+
+    def __init__(self, bits: int = 32):
+        if not 1 <= bits <= self.MAX_BITS:
+            raise ValueError(f"Sequence number bits must be in 1..{self.MAX_BITS}")
+        self.bits = bits
+        self.size = 1 << bits
+        self.mask = self.size - 1
+
+    def add(self, seq_num: int, n: int) -> int:
+        return (seq_num + n) & self.mask
+
+    def diff(self, seq_num: int, base: int) -> int:
+        """How far seq_num lies ahead of base, in [0, 2^k)."""
+        return (seq_num - base) & self.mask
+
+    def check_window(self, window_size: int, selective: bool, sack: bool = False):
+        """
+        Raises ValueError if the window is too large to tell new packets from old:
+        W <= 2^k - 1 for Go-Back-N, W <= 2^(k-1) for Selective Repeat.
+        Selective Repeat with selective ACKs needs W <= 2^(k-1) - 1: their
+        cumulative ACK numbers range over [base - W, base + W].
+        These limits only hold on an in-order channel; check_channel() makes sure
+        of that for any space smaller than the header field.
+        """
+        limit = self.size // 2 if selective else self.size - 1
+        if sack:
+            limit -= 1
+        if not 1 <= window_size <= limit:
+            protocol = "Selective Repeat" if selective else "Go-Back-N"
+            raise ValueError(
+                f"{protocol} window must be in 1..{limit} "
+                f"for {self.bits}-bit sequence numbers"
+            )
+
+    def check_channel(self, channel):
+        """
+        Raises ValueError if `channel` can reorder packets and the space is
+        narrower than the header field. A late duplicate (a retransmission
+        overtaken under jitter, say) can then arrive after its number has been
+        reused and be taken for new data or a new ACK, whatever the window. With
+        32 bits, a number is not reused within any packet's lifetime.
+        """
+        if self.bits < self.MAX_BITS and channel.reorders:
+            raise ValueError(
+                f"{self.bits}-bit sequence numbers need an in-order channel "
+                "(no delay jitter, reordering or trace replay)"
+            )
+
+    def ring_size(self, window_size: int) -> int:
+        """
+        Smallest power of two >= window_size. It divides 2^k, so `seq_num % ring_size`
+        gives distinct slots to any window_size consecutive sequence numbers.
+        """
+        return 1 << (window_size - 1).bit_length()
@@ -1,6 +1,6 @@
-import time
 import threading
-from typing import List, Dict
+from typing import List, Optional
+from src.eventlog import DEBUG
 from src.packet import Packet
 from src.rdt_base import RDTSender, RDTReceiver
 from src.channel import UnreliableChannel
@@ -18,93 +18,211 @@ class SRSender(RDTSender):
         window_size: int = 4,
         timeout: float = 1.0,
         observer=None,
+        segment_size: int = 1024,
+        seq_bits: int = 32,
+        rto: str = "fixed",
+        congestion: str = "none",
     ):
-        super().__init__(channel, receiver_queue, observer)
-        self.window_size = window_size
-        self.timeout = timeout
+        super().__init__(
+            channel,
+            receiver_queue,
+            observer,
+            segment_size,
+            seq_bits,
+            timeout,
+            rto,
+            congestion,
+        )
+        self.seq_space.check_window(window_size, selective=True)
+        self._init_window(window_size)
+        # base and next_seq_num wrap around the sequence space
         self.base = 0
         self.next_seq_num = 0
-        self.packets: List[Packet] = []
-        self.acked: List[bool] = []
-        self.packet_timers: Dict[int, threading.Timer] = {}
+        # Per-packet state in rings indexed by seq_num & ring_mask;
+        # slots are cleared as base advances past them
+        ring_size = self.seq_space.ring_size(window_size)
+        self.ring_mask = ring_size - 1
+        self.packets: List[Optional[Packet]] = [None] * ring_size
+        # Bit i set: base + i has been acknowledged. As an int relative to base,
+        # a selective ACK is merged with one mask instead of a per-seq_num loop.
+        self.acked_bits = 0
+        self.packet_timers: List[Optional[object]] = [None] * ring_size
+        # First-transmission times for RTT sampling; None once retransmitted
+        self.sent_at: List[Optional[float]] = [None] * ring_size
         self.lock = threading.Lock()
+        # Signalled whenever base advances, so the send loop can refill the window
+        self.window_open = threading.Condition(self.lock)
 
-    def send_data(self, data: bytes):
-        chunk_size = 1024
-        for i in range(0, len(data), chunk_size):
-            chunk = data[i : i + chunk_size]
-            packet = Packet(
-                seq_num=len(self.packets), ack_num=0, flags=0, payload=chunk
-            )
-            self.packets.append(packet)
-            self.acked.append(False)
+    def send_data(self, data):
+        self._open_source(data)
+
+        if self.clock.virtual:
+            with self.lock:
+                self._fill_window()
+            return
 
         threading.Thread(target=self._send_window, daemon=True).start()
 
     def _send_window(self):
-        while self.running and self.base < len(self.packets):
-            with self.lock:
-                while (
-                    self.running
-                    and self.next_seq_num < self.base + self.window_size
-                    and self.next_seq_num < len(self.packets)
-                ):
-                    self._send_packet(self.next_seq_num)
-                    self.next_seq_num += 1
-            time.sleep(0.01)
+        with self.window_open:
+            while self.running and not self.is_finished():
+                self._fill_window()
+                self.window_open.wait()
+
+    def _fill_window(self):
+        """Sends every unsent packet that fits in the window. Caller holds self.lock."""
+        seq_space = self.seq_space
+        while (
+            self.running
+            and seq_space.diff(self.next_seq_num, self.base) < self._window()
+        ):
+            payload = self._next_payload()
+            if payload is None:
+                break
+            self.packets[self.next_seq_num & self.ring_mask] = Packet(
+                seq_num=self.next_seq_num, ack_num=0, flags=0, payload=payload
+            )
+            self.sent_at[self.next_seq_num & self.ring_mask] = self.clock.now()
+            self._send_packet(self.next_seq_num)
+            self.next_seq_num = seq_space.add(self.next_seq_num, 1)
+
+    def _in_window(self, seq_num: int) -> bool:
+        """True if seq_num has been sent and lies in [base, next_seq_num)."""
+        return self.seq_space.diff(seq_num, self.base) < self.seq_space.diff(
+            self.next_seq_num, self.base
+        )
 
     def _send_packet(self, seq_num: int):
         if not self.running:
             return
-        packet = self.packets[seq_num]
-        print(f"SR Sender: Sending packet {seq_num}")
+        packet = self.packets[seq_num & self.ring_mask]
+        if self.events.level <= DEBUG:
+            self.events.debug("sr.sender", "send", seq=seq_num)
+        self.metrics.inc("sender.packets_sent")
         self.channel.send(packet, self.receiver_queue)
         self._start_timer(seq_num)
 
     def _start_timer(self, seq_num: int):
-        if seq_num in self.packet_timers:
-            self.packet_timers[seq_num].cancel()
+        index = seq_num & self.ring_mask
+        if self.packet_timers[index] is not None:
+            self.packet_timers[index].cancel()
 
         if self.running:
-            timer = threading.Timer(self.timeout, self._timeout_handler, args=[seq_num])
-            self.packet_timers[seq_num] = timer
-            timer.start()
+            self.packet_timers[index] = self.clock.call_later(
+                self.rtt.rto, self._timeout_handler, seq_num
+            )
 
     def _stop_timer(self, seq_num: int):
-        if seq_num in self.packet_timers:
-            self.packet_timers[seq_num].cancel()
-            del self.packet_timers[seq_num]
+        index = seq_num & self.ring_mask
+        if self.packet_timers[index] is not None:
+            self.packet_timers[index].cancel()
+            self.packet_timers[index] = None
 
     def _timeout_handler(self, seq_num: int):
         if not self.running:
             return
         with self.lock:
-            if not self.acked[seq_num]:
-                print(f"SR Sender: Timeout! Retransmitting packet {seq_num}")
+            offset = self.seq_space.diff(seq_num, self.base)
+            if self._in_window(seq_num) and not self.acked_bits >> offset & 1:
+                self.events.info("sr.sender", "timeout", seq=seq_num, base=self.base)
+                self.metrics.inc("sender.timeouts")
+                self.metrics.inc("sender.retransmissions")
+                if seq_num == self.base:
+                    # Back off once per loss episode, as a single-timer sender
+                    # would, rather than once per expiring packet timer
+                    self.rtt.backoff()
+                self._congestion_event(seq_num, timeout=True)
+                self.sent_at[seq_num & self.ring_mask] = None
+                self.retransmissions += 1
+                self.timeout_retransmissions += 1
                 self._send_packet(seq_num)
 
     def process_ack(self, packet: Packet):
         if packet.is_corrupt():
+            self.metrics.inc("sender.acks_corrupt")
             return
 
+        self.metrics.inc("sender.acks_received")
         with self.lock:
-            ack_num = packet.ack_num
-            print(f"SR Sender: Received ACK {ack_num}")
-            if self.base <= ack_num < self.next_seq_num:
-                if not self.acked[ack_num]:
-                    self.acked[ack_num] = True
-                    self._stop_timer(ack_num)
+            if packet.flags & Packet.SACK:
+                newest, count = self._process_sack(packet)
+            else:
+                ack_num = packet.ack_num
+                if self.events.level <= DEBUG:
+                    self.events.debug("sr.sender", "ack", ack=ack_num, base=self.base)
+                newest, count = None, 0
+                if self._in_window(ack_num):
+                    offset = self.seq_space.diff(ack_num, self.base)
+                    newest, count = self._mark_acked(1 << offset)
+            if newest is None:
+                self.metrics.inc("sender.acks_duplicate")
+                return
+            self._on_new_ack(self.sent_at[newest & self.ring_mask])
+            if self.cc:
+                self.cc.on_ack(count)
 
-                    # Advance base if possible
-                    while self.base < len(self.packets) and self.acked[self.base]:
-                        self.base += 1
+            # Advance base past the run of acknowledged packets, releasing them
+            run = (~self.acked_bits & (self.acked_bits + 1)).bit_length() - 1
+            for i in range(run):
+                index = (self.base + i) & self.ring_mask
+                self.packets[index] = None
+                self.sent_at[index] = None
+            self.acked_bits >>= run
+            self.base = self.seq_space.add(self.base, run)
+            if self.clock.virtual:
+                self._fill_window()
+            else:
+                self.window_open.notify()
+            self._record_window()
+
+    def _mark_acked(self, bits: int):
+        """
+        Marks the packets in `bits` (bit i: base + i) acknowledged and stops their
+        timers. Returns (newest newly acknowledged seq_num or None, how many were new).
+        """
+        new = bits & ~self.acked_bits
+        if not new:
+            return None, 0
+        self.acked_bits |= new
+        offset = count = 0
+        while new:
+            lowest = new & -new
+            new ^= lowest
+            offset = lowest.bit_length() - 1
+            count += 1
+            self._stop_timer(self.seq_space.add(self.base, offset))
+        return self.seq_space.add(self.base, offset), count
+
+    def _process_sack(self, packet: Packet):
+        """
+        Marks everything below the cumulative ACK and every seq_num in the bitmap.
+        Returns what _mark_acked does.
+        """
+        ack_num = packet.ack_num
+        if self.events.level <= DEBUG:
+            self.events.debug(
+                "sr.sender",
+                "sack",
+                ack=ack_num,
+                bitmap=hex(packet.sack_bitmap()),
+                base=self.base,
+            )
+        covered = self.seq_space.diff(ack_num, self.base)
+        outstanding = self.seq_space.diff(self.next_seq_num, self.base)
+        if covered > outstanding:
+            return None, 0  # From before base: nothing new
+        # Bit i of the SACK bitmap is ack_num + 1 + i, i.e. base + covered + 1 + i
+        bits = (1 << covered) - 1 | packet.sack_bitmap() << (covered + 1)
+        return self._mark_acked(bits & ((1 << outstanding) - 1))
 
     def stop(self):
         super().stop()
         with self.lock:
-            for timer in self.packet_timers.values():
-                timer.cancel()
-            self.packet_timers.clear()
+            for i, timer in enumerate(self.packet_timers):
+                if timer is not None:
+                    timer.cancel()
+                    self.packet_timers[i] = None
+            self.window_open.notify()
 
 
 class SRReceiver(RDTReceiver):
@@ -118,36 +236,120 @@ class SRReceiver(RDTReceiver):
         sender_queue,
         window_size: int = 4,
         observer=None,
+        segment_size: int = 1024,
+        seq_bits: int = 32,
+        sack: bool = False,
+        ack_every: int = 1,
+        ack_delay: float = 0.0,
     ):
-        super().__init__(channel, sender_queue, observer)
+        super().__init__(channel, sender_queue, observer, seq_bits)
+        self.seq_space.check_window(window_size, selective=True, sack=sack)
         self.window_size = window_size
-        self.base = 0
-        self.buffer: Dict[int, Packet] = {}  # Buffer for out-of-order packets
+        # With sack, each ACK carries the cumulative ACK plus a bitmap of the
+        # window, so ACKs can be coalesced: one goes out every `ack_every` packets,
+        # or `ack_delay` seconds after the first packet it covers.
+        if not sack and ack_every > 1:
+            raise ValueError("Coalescing ACKs requires selective ACKs")
+        self.sack = sack
+        self.ack_every = ack_every
+        self.ack_delay = ack_delay
+        self._pending_acks = 0
+        self._ack_timer = None
+        self.lock = threading.Lock()
+        # Every segment but the last is full, so a segment's stream offset is
+        # (number of segments before it) * segment_size
+        self.segment_size = segment_size
+        # Out-of-order data never reaches past the window, so with room for two
+        # windows the buffer's space is reused and never regrown
+        self.received_data.reserve(2 * window_size * segment_size)
+        self.base = 0  # Wraps around the sequence space
+        self.delivered_segments = 0  # Segments below base, without wraparound
 
     def receive_packet(self, packet: Packet):
         if packet.is_corrupt():
-            print("SR Receiver: Received corrupt packet")
+            if self.events.level <= DEBUG:
+                self.events.debug("sr.receiver", "corrupt")
+            self.metrics.inc("receiver.packets_corrupt")
             return
 
         seq_num = packet.seq_num
-        print(f"SR Receiver: Received packet {seq_num}")
+        if self.events.level <= DEBUG:
+            self.events.debug("sr.receiver", "receive", seq=seq_num)
+        self.metrics.inc("receiver.packets_received")
 
-        if self.base <= seq_num < self.base + self.window_size:
-            # Inside window
-            self._send_ack(seq_num)
-            if seq_num not in self.buffer:
-                self.buffer[seq_num] = packet
+        with self.lock:
+            ahead = self.seq_space.diff(seq_num, self.base)
+            if ahead < self.window_size:
+                # Inside window: out-of-order data waits in the reassembly buffer
+                if not self.sack:
+                    self._send_ack(seq_num)
+                self._deliver_data(
+                    packet.payload,
+                    (self.delivered_segments + ahead) * self.segment_size,
+                )
 
-            # Deliver consecutive packets
-            while self.base in self.buffer:
-                self.received_data.append(self.buffer[self.base].payload)
-                del self.buffer[self.base]
-                self.base += 1
+                # Advance past every segment now in the contiguous prefix
+                delivered_segments = -(-self.delivered_bytes // self.segment_size)
+                self.base = self.seq_space.add(
+                    self.base, delivered_segments - self.delivered_segments
+                )
+                self.delivered_segments = delivered_segments
+                if self.metrics.enabled:
+                    if ahead:
+                        self.metrics.inc("receiver.packets_out_of_order")
+                    self.metrics.sample(
+                        "receiver.buffered_bytes", self.received_data.buffered_bytes()
+                    )
+                if self.sack:
+                    self._queue_ack()
 
-        elif self.base - self.window_size <= seq_num < self.base:
-            # Already received, re-ACK
-            self._send_ack(seq_num)
+            elif self.seq_space.diff(self.base, seq_num) <= self.window_size:
+                # Already received, re-ACK (at once: the sender is retransmitting)
+                self.metrics.inc("receiver.packets_duplicate")
+                if self.sack:
+                    self._flush_ack()
+                else:
+                    self._send_ack(seq_num)
 
     def _send_ack(self, ack_num: int):
-        ack_packet = Packet(seq_num=0, ack_num=ack_num, flags=Packet.ACK)
-        self.channel.send(ack_packet, self.sender_queue)
+        self.acks_sent += 1
+        self.metrics.inc("receiver.acks_sent")
+        self.channel.send(Packet.ack(ack_num), self.sender_queue)
+
+    def _queue_ack(self):
+        """Counts a packet towards the next coalesced ACK. Caller holds self.lock."""
+        self._pending_acks += 1
+        if self._pending_acks >= self.ack_every:
+            self._flush_ack()
+        elif self._ack_timer is None:
+            self._ack_timer = self.clock.call_later(self.ack_delay, self._ack_timeout)
+
+    def _ack_timeout(self):
+        with self.lock:
+            self._ack_timer = None
+            if self._pending_acks and self.running:
+                self._flush_ack()
+
+    def _flush_ack(self):
+        """Sends a selective ACK for the whole window. Caller must hold self.lock."""
+        if self._ack_timer is not None:
+            self._ack_timer.cancel()
+            self._ack_timer = None
+        self._pending_acks = 0
+
+        # Out-of-order byte ranges map to runs of segments ahead of base
+        bitmap = 0
+        for start, end in self.received_data.ranges():
+            first = start // self.segment_size - self.delivered_segments
+            last = -(-end // self.segment_size) - self.delivered_segments
+            bitmap |= ((1 << (last - first)) - 1) << (first - 1)
+        self.acks_sent += 1
+        self.metrics.inc("receiver.acks_sent")
+        self.channel.send(Packet.sack(self.base, bitmap), self.sender_queue)
+
+    def stop(self):
+        super().stop()
+        with self.lock:
+            if self._ack_timer is not None:
+                self._ack_timer.cancel()
+                self._ack_timer = None
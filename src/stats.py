@@ -0,0 +1,66 @@
+import math
+from typing import NamedTuple, Sequence
+
+# Two-sided 95% critical values of Student's t for 1..30 degrees of freedom
+_T_95 = [
+    12.706,
+    4.303,
+    3.182,
+    2.776,
+    2.571,
+    2.447,
+    2.365,
+    2.306,
+    2.262,
+    2.228,
+    2.201,
+    2.179,
+    2.160,
+    2.145,
+    2.131,
+    2.120,
+    2.110,
+    2.101,
+    2.093,
+    2.086,
+    2.080,
+    2.074,
+    2.069,
+    2.064,
+    2.060,
+    2.056,
+    2.052,
+    2.048,
+    2.045,
+    2.042,
+]
+
+
+def t_critical_95(df: int) -> float:
+    """Two-sided 95% Student's t critical value (normal approximation past 30 df)."""
+    if df < 1:
+        return math.inf
+    return _T_95[df - 1] if df <= len(_T_95) else 1.96
+
+
+class Summary(NamedTuple):
+    n: int
+    mean: float
+    stddev: float
+    half_width: float  # 95% confidence interval is mean +/- half_width
+
+    @property
+    def relative_half_width(self) -> float:
+        return self.half_width / abs(self.mean) if self.mean else math.inf
+
+
+def summarize(values: Sequence[float]) -> Summary:
+    """Mean, sample standard deviation and 95% t-interval half-width."""
+    n = len(values)
+    if n == 0:
+        return Summary(0, math.nan, math.nan, math.inf)
+    mean = sum(values) / n
+    if n == 1:
+        return Summary(1, mean, 0.0, math.inf)
+    stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+    return Summary(n, mean, stddev, t_critical_95(n - 1) * stddev / math.sqrt(n))
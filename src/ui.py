@@ -1,5 +1,6 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext
+from tkinter import filedialog, ttk, scrolledtext
+import collections
 import queue
 import threading
 import time
@@ -7,6 +8,14 @@ import random
 import string
 from src.packet import Packet
 from src.channel import UnreliableChannel
+from src.channel_models import (
+    TraceReplay,
+    load_trace,
+    make_delay_model,
+    make_loss_model,
+)
+from src.clock import REAL_CLOCK
+from src.metrics import Metrics
 from src.gbn import GBNSender, GBNReceiver
 from src.sr import SRSender, SRReceiver
 
@@ -32,6 +41,20 @@ class UIObserver:
 
 
 class RDTApp:
+    EVENT_BUDGET = 0.008  # Seconds of each 20 ms frame spent draining events
+    COALESCE_BACKLOG = 500  # Queued events beyond which stale sends are skipped
+    POOL_LIMIT = 2000  # Hidden packet labels kept for reuse
+    # Animations in flight above which lanes are drawn as density bars instead
+    # of one label per packet, and below which labels come back
+    LOD_ENTER = 300
+    LOD_EXIT = 200
+    LOD_BINS = 20  # Density cells per lane between sender and receiver
+    LANES = 10
+    _DENSITY_COLORS = (
+        ("", "#c6dbef", "#6baed6", "#2171b5", "#08306b"),  # Data, by count level
+        ("", "#c7e9c0", "#74c476", "#238b45", "#00441b"),  # ACKs
+    )
+
     def __init__(self, root):
         self.root = root
         self.root.title("RDT Protocol Visualization")
@@ -43,12 +66,23 @@ class RDTApp:
         self.running_experiment = False
         self.sender = None
         self.receiver = None
-        self.animations = (
-            []
-        )  # List of active animations: {'id': item_id, 'start_time': t, 'end_time': t, 'start_x': x, 'end_x': x, 'y': y, 'color': c}
+        self.channels = []
+        self.metrics = Metrics(REAL_CLOCK)  # Replaced at each start
+        # Active animations: {'id': item_id, 'start_time': t, 'end_time': t,
+        # 'start_x': x, 'end_x': x, 'y': y, 'packet': p, 'status': s, 'slot': i},
+        # where slot is the animation's index in this list
+        self.animations = []
+        # id(packet) -> deque of that packet's animations still in transit, oldest first
+        self.in_transit = {}
+        self.item_pool = []  # Hidden canvas text items, reused by new animations
+        self.low_detail = False
+        self.density_items = None  # Per-cell rectangles, created on first use
+        self.density_levels = []
+        self.frame_times = collections.deque(maxlen=50)  # Seconds per UI frame
 
         self._setup_ui()
         self._start_ui_loop()
+        self._start_stats_loop()
 
     def _setup_ui(self):
         # Configuration Frame
@@ -79,6 +113,12 @@ class RDTApp:
         self.timeout_entry.insert(0, "1.0")
         self.timeout_entry.grid(row=0, column=6)
 
+        # Adaptive: the timeout above is only the initial RTO
+        self.adaptive_rto_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            config_frame, text="Adaptive RTO", variable=self.adaptive_rto_var
+        ).grid(row=0, column=7)
+
         ttk.Label(config_frame, text="Loss Rate:").grid(row=1, column=0, padx=5)
         self.loss_entry = ttk.Entry(config_frame, width=5)
         self.loss_entry.insert(0, "0.1")
@@ -99,6 +139,20 @@ class RDTApp:
         self.size_entry.insert(0, "5000")
         self.size_entry.grid(row=1, column=7)
 
+        ttk.Label(config_frame, text="Loss Model:").grid(row=2, column=0, padx=5)
+        self.loss_model_entry = ttk.Entry(config_frame, width=16)
+        self.loss_model_entry.insert(0, "bernoulli")
+        self.loss_model_entry.grid(row=2, column=1, columnspan=2, pady=5)
+
+        ttk.Label(config_frame, text="Delay Model:").grid(row=2, column=3, padx=5)
+        self.delay_model_entry = ttk.Entry(config_frame, width=16)
+        self.delay_model_entry.insert(0, "uniform")
+        self.delay_model_entry.grid(row=2, column=4, columnspan=2)
+
+        ttk.Label(config_frame, text="Trace File:").grid(row=2, column=6, padx=5)
+        self.trace_entry = ttk.Entry(config_frame, width=16)
+        self.trace_entry.grid(row=2, column=7, columnspan=2)
+
         ttk.Label(config_frame, text="Speed:").grid(row=0, column=8, padx=5)
         self.speed_scale = tk.Scale(
             config_frame,
@@ -131,6 +185,17 @@ class RDTApp:
         self.receiver_x = 900
         self.canvas_height = 400
 
+        # Live counters from the metrics registry
+        stats_frame = ttk.LabelFrame(self.root, text="Stats")
+        stats_frame.pack(fill="x", padx=10, pady=5)
+        self.stats_label = ttk.Label(
+            stats_frame, text="", font=("Courier", 9), justify="left"
+        )
+        self.stats_label.pack(side="left", fill="x", expand=True, padx=5)
+        ttk.Button(stats_frame, text="Export JSON", command=self.export_metrics).pack(
+            side="right", padx=5, pady=5
+        )
+
         # Log
         log_frame = ttk.LabelFrame(self.root, text="Logs")
         log_frame.pack(fill="both", expand=True, padx=10, pady=5)
@@ -141,6 +206,10 @@ class RDTApp:
 
     def draw_static(self):
         self.canvas.delete("all")
+        # Everything pooled or drawn for low detail went with it
+        self.item_pool = []
+        self.density_items = None
+        self.low_detail = False
         # Sender
         self.canvas.create_rectangle(
             self.sender_x - 40,
@@ -173,6 +242,19 @@ class RDTApp:
         self.log_area.see("end")
         self.log_area.config(state="disabled")
 
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json", filetypes=[("JSON", "*.json")]
+        )
+        if not path:
+            return
+        try:
+            self.metrics.to_json(path)
+        except OSError as e:
+            self.log(f"Error: Could not export metrics ({e})")
+            return
+        self.log(f"Metrics exported to {path}")
+
     def start_experiment(self):
         if self.running_experiment:
             return
@@ -186,17 +268,35 @@ class RDTApp:
             delay = float(self.delay_entry.get())
             data_size = int(self.size_entry.get())
             speed = self.speed_scale.get()
+            rto = "adaptive" if self.adaptive_rto_var.get() else "fixed"
 
             # Adjust for speed (Slower speed = Higher delay/timeout)
             # Speed 1.0 = Normal
             # Speed 0.5 = 2x Slower (2x Delay)
             # Speed 2.0 = 2x Faster (0.5x Delay)
+            scale = 1.0
             if speed > 0:
+                scale = 1.0 / speed
                 delay = delay / speed
                 timeout = timeout / speed
 
-        except ValueError:
-            self.log("Error: Invalid parameters")
+            # Built per direction: Gilbert-Elliott models carry their own state
+            loss_spec = self.loss_model_entry.get().strip() or "bernoulli"
+            delay_spec = self.delay_model_entry.get().strip() or "uniform"
+            models = [
+                {
+                    "loss_model": make_loss_model(loss_spec, loss),
+                    "delay_model": make_delay_model(delay_spec, delay, scale),
+                }
+                for _ in range(2)
+            ]
+            trace_path = self.trace_entry.get().strip()
+            if trace_path:
+                # Trace replays only on the data channel
+                models[0]["trace"] = TraceReplay(load_trace(trace_path), scale)
+
+        except (ValueError, OSError) as e:
+            self.log(f"Error: Invalid parameters ({e})")
             return
 
         self.running_experiment = True
@@ -204,11 +304,23 @@ class RDTApp:
         self.stop_btn.config(state="normal")
         self.draw_static()
         self.animations = []
+        self.in_transit = {}
+        self.metrics = Metrics(REAL_CLOCK)
 
         # Run in thread
         threading.Thread(
             target=self._run_simulation,
-            args=(protocol, window_size, timeout, loss, corruption, delay, data_size),
+            args=(
+                protocol,
+                window_size,
+                timeout,
+                rto,
+                loss,
+                corruption,
+                delay,
+                data_size,
+                models,
+            ),
             daemon=True,
         ).start()
 
@@ -217,12 +329,16 @@ class RDTApp:
             self.sender.stop()
         if self.receiver:
             self.receiver.stop()
+        for channel in self.channels:
+            channel.close()
+        self.channels = []
         self.running_experiment = False
         self.start_btn.config(state="normal")
         self.stop_btn.config(state="disabled")
 
         # Clear animations and queue
         self.animations.clear()
+        self.in_transit.clear()
         with self.event_queue.mutex:
             self.event_queue.queue.clear()
 
@@ -232,18 +348,42 @@ class RDTApp:
         self.log("Experiment stopped.")
 
     def _run_simulation(
-        self, protocol, window_size, timeout, loss, corruption, delay, data_size
+        self,
+        protocol,
+        window_size,
+        timeout,
+        rto,
+        loss,
+        corruption,
+        delay,
+        data_size,
+        models,
     ):
         self.log(f"Starting {protocol.upper()} simulation...")
 
         # Create channels with observer
         # Note: We use the SAME observer for both channels to simplify UI handling
         forward_channel = UnreliableChannel(
-            loss, corruption, delay, 0.0, observer=self.observer
+            loss,
+            corruption,
+            delay,
+            0.0,
+            observer=self.observer,
+            metrics=self.metrics,
+            name="forward",
+            **models[0],
         )
         backward_channel = UnreliableChannel(
-            loss, corruption, delay, 0.0, observer=self.observer
+            loss,
+            corruption,
+            delay,
+            0.0,
+            observer=self.observer,
+            metrics=self.metrics,
+            name="backward",
+            **models[1],
         )
+        self.channels = [forward_channel, backward_channel]
 
         # Queues
         # We create the queues manually to wire them up
@@ -309,6 +449,7 @@ class RDTApp:
                 window_size,
                 timeout,
                 observer=self.observer,
+                rto=rto,
             )
 
             # Update Receiver's sender queue
@@ -325,6 +466,7 @@ class RDTApp:
                 window_size,
                 timeout,
                 observer=self.observer,
+                rto=rto,
             )
             self.receiver.sender_queue = self.sender.sender_queue
 
@@ -334,121 +476,305 @@ class RDTApp:
 
         # Send data
         data = "".join(random.choices(string.ascii_letters, k=data_size)).encode()
+        done = self.receiver.expect(len(data))
         self.sender.send_data(data)
 
-        # Monitor completion
+        # Monitor completion; the timeout only lets us notice a user stop
         while self.running_experiment:
-            if len(self.receiver.get_received_data()) >= len(data):
+            if done.wait(0.5):
                 self.log("Transfer Complete!")
+                rtt = self.sender.rtt
+                if rtt.srtt is not None:
+                    self.log(
+                        f"SRTT {rtt.srtt * 1000:.1f} ms, "
+                        f"RTTVAR {rtt.rttvar * 1000:.1f} ms, "
+                        f"RTO {rtt.rto * 1000:.1f} ms"
+                    )
                 break
-            time.sleep(0.5)
 
-        self.stop_experiment()
+        # Tk (and the animation state) belongs to the UI thread
+        self.root.after(0, self.stop_experiment)
 
     def _start_ui_loop(self):
-        self._process_events()
-        self._animate()
-        self.root.after(20, self._start_ui_loop)
+        # Frame time: the callback's event handling and canvas updates, not Tk's redraw
+        start = time.perf_counter()
+        try:
+            self._process_events()
+            self._animate()
+        finally:
+            # Keep the frame loop alive even if one frame fails
+            frame_time = time.perf_counter() - start
+            self.frame_times.append(frame_time)
+            self.metrics.observe("ui.frame_time", frame_time)
+            self.root.after(20, self._start_ui_loop)
+
+    def _start_stats_loop(self):
+        self._update_stats()
+        self.root.after(500, self._start_stats_loop)
+
+    def _update_stats(self):
+        snapshot = self.metrics.snapshot()
+        c = snapshot["counters"]
+        rtt = snapshot["histograms"].get("sender.rtt")
+        rtt_text = "-"
+        if rtt and rtt["count"]:
+            rtt_text = (
+                f"mean {rtt['mean'] * 1000:.1f} ms, "
+                f"p99 <= {(rtt['p99'] or 0) * 1000:.0f} ms"
+            )
+        lines = [
+            f"Sender:   sent {c.get('sender.packets_sent', 0)}, "
+            f"retransmitted {c.get('sender.retransmissions', 0)} "
+            f"(timeouts {c.get('sender.timeouts', 0)}, "
+            f"fast {c.get('sender.fast_retransmits', 0)}), "
+            f"ACKs {c.get('sender.acks_received', 0)} "
+            f"(dup {c.get('sender.acks_duplicate', 0)}, "
+            f"corrupt {c.get('sender.acks_corrupt', 0)}), "
+            f"RTT {rtt_text}",
+            f"Receiver: received {c.get('receiver.packets_received', 0)} "
+            f"(out of order {c.get('receiver.packets_out_of_order', 0)}, "
+            f"dup {c.get('receiver.packets_duplicate', 0)}, "
+            f"corrupt {c.get('receiver.packets_corrupt', 0)}), "
+            f"ACKs sent {c.get('receiver.acks_sent', 0)}",
+        ]
+        for name in ("forward", "backward"):
+            lines.append(
+                f"{name.capitalize() + ':':<9} sent {c.get(name + '.sent', 0)}, "
+                f"lost {c.get(name + '.lost', 0)}, "
+                f"corrupted {c.get(name + '.corrupted', 0)}, "
+                f"delivered {c.get(name + '.delivered', 0)}"
+            )
+        if self.frame_times:
+            lines.append(
+                f"UI:       frame "
+                f"{sum(self.frame_times) / len(self.frame_times) * 1000:.1f} ms avg, "
+                f"{max(self.frame_times) * 1000:.1f} ms max, "
+                f"{len(self.animations)} in flight, "
+                f"{'low' if self.low_detail else 'full'} detail"
+            )
+        self.stats_label.config(text="\n".join(lines))
 
     def _process_events(self):
-        while not self.event_queue.empty():
+        """
+        Drains channel events for at most EVENT_BUDGET seconds per frame; the rest
+        wait for the next frame. With more than COALESCE_BACKLOG events queued,
+        SENT events for packets that would already have arrived are dropped
+        unanimated, so the backlog shrinks instead of growing.
+        """
+        deadline = time.perf_counter() + self.EVENT_BUDGET
+        coalesce = self.event_queue.qsize() > self.COALESCE_BACKLOG
+        now = time.time()
+        logs = []
+        while time.perf_counter() < deadline:
             try:
                 event = self.event_queue.get_nowait()
-                type = event[0]
-
-                if type == "LOG":
-                    self.log(event[1])
-                elif type == "SENT":
-                    # ('SENT', packet, delay, start_time)
-                    packet, delay, start_time = event[1], event[2], event[3]
-                    is_ack = packet.flags & Packet.ACK
-
-                    # Create animation object
-                    start_x = self.receiver_x if is_ack else self.sender_x
-                    end_x = self.sender_x if is_ack else self.receiver_x
-
-                    # Visual representation
-                    color = "green" if is_ack else "blue"
-                    text = f"ACK{packet.ack_num}" if is_ack else f"SEQ{packet.seq_num}"
-
-                    # Random Y offset to avoid overlap
-                    y = (
-                        100 + (packet.seq_num % 10) * 20
-                        if not is_ack
-                        else 100 + (packet.ack_num % 10) * 20
-                    )
-
-                    item_id = self.canvas.create_text(
-                        start_x, y, text=text, fill=color, font=("Arial", 10, "bold")
-                    )
-
-                    anim = {
-                        "id": item_id,
-                        "start_time": start_time,
-                        "end_time": start_time + delay,
-                        "start_x": start_x,
-                        "end_x": end_x,
-                        "y": y,
-                        "packet": packet,
-                        "status": "transit",
-                    }
-                    self.animations.append(anim)
-
-                elif type == "LOST":
-                    packet = event[1]
-                    # Find the animation for this packet and mark it lost
-                    for anim in self.animations:
-                        if anim["packet"] == packet and anim["status"] == "transit":
-                            anim["status"] = "lost"
-                            self.canvas.itemconfig(anim["id"], fill="red")
-                            break
-
-                elif type == "CORRUPT":
-                    packet = event[1]
-                    for anim in self.animations:
-                        if anim["packet"] == packet and anim["status"] == "transit":
-                            anim["status"] = "corrupt"
-                            self.canvas.itemconfig(anim["id"], fill="orange")
-                            break
-
-                elif type == "DELIVERED":
-                    packet = event[1]
-                    # Animation will finish naturally, but we can flash it or remove it
-                    pass
-
             except queue.Empty:
                 break
+            type = event[0]
+
+            if type == "SENT":
+                # ('SENT', packet, delay, start_time)
+                packet, delay, start_time = event[1], event[2], event[3]
+                if coalesce and start_time + delay <= now:
+                    continue
+                self._add_animation(packet, delay, start_time)
+
+            elif type == "LOST":
+                # Losses are reported mid-transit: the oldest transmission in flight
+                anim = self._take_in_transit(event[1], newest=False)
+                if anim:
+                    anim["status"] = "lost"
+                    self.canvas.itemconfig(anim["id"], fill="red")
+
+            elif type == "CORRUPT":
+                # Corruption is reported right after the send: the newest transmission
+                anim = self._take_in_transit(event[1], newest=True)
+                if anim:
+                    anim["status"] = "corrupt"
+                    self.canvas.itemconfig(anim["id"], fill="orange")
+
+            elif type == "LOG":
+                logs.append(event[1])
+
+            # DELIVERED: the animation finishes on its own
+
+        if logs:
+            self.log("\n".join(logs))
+
+    def _add_animation(self, packet, delay, start_time):
+        is_ack = packet.flags & Packet.ACK
+
+        start_x = self.receiver_x if is_ack else self.sender_x
+        end_x = self.sender_x if is_ack else self.receiver_x
+
+        # Visual representation
+        color = "green" if is_ack else "blue"
+        text = f"ACK{packet.ack_num}" if is_ack else f"SEQ{packet.seq_num}"
+
+        # Y offset by sequence number to avoid overlap
+        y = 100 + ((packet.ack_num if is_ack else packet.seq_num) % 10) * 20
+
+        item_id = self._acquire_item(start_x, y, text, color)
+
+        anim = {
+            "id": item_id,
+            "start_time": start_time,
+            "end_time": start_time + delay,
+            "start_x": start_x,
+            "end_x": end_x,
+            "y": y,
+            "packet": packet,
+            "status": "transit",
+            "slot": len(self.animations),
+        }
+        self.animations.append(anim)
+        # Retransmissions reuse the same Packet object, so each packet keeps a
+        # FIFO of its transmissions in flight; the anim holds the packet, so
+        # its id() can't be reused while the entry exists.
+        pending = self.in_transit.get(id(packet))
+        if pending is None:
+            pending = self.in_transit[id(packet)] = collections.deque()
+        pending.append(anim)
+
+    def _take_in_transit(self, packet, newest: bool):
+        """Removes and returns one of the packet's in-transit animations, if any."""
+        pending = self.in_transit.get(id(packet))
+        if not pending:
+            return None
+        anim = pending.pop() if newest else pending.popleft()
+        if not pending:
+            del self.in_transit[id(packet)]
+        return anim
+
+    def _remove_animation(self, anim):
+        """Swap-remove: the last animation takes this one's slot."""
+        last = self.animations.pop()
+        if last is not anim:
+            self.animations[anim["slot"]] = last
+            last["slot"] = anim["slot"]
+        pending = self.in_transit.get(id(anim["packet"]))
+        if anim["status"] == "transit" and pending and anim in pending:
+            pending.remove(anim)  # Almost always the only or first entry
+            if not pending:
+                del self.in_transit[id(anim["packet"])]
+        self._release_item(anim["id"])
+
+    def _acquire_item(self, x, y, text, color):
+        """A packet label from the pool, or a new one; hidden in low detail."""
+        state = "hidden" if self.low_detail else "normal"
+        if self.item_pool:
+            item_id = self.item_pool.pop()
+            self.canvas.coords(item_id, x, y)
+            self.canvas.itemconfig(item_id, text=text, fill=color, state=state)
+            return item_id
+        return self.canvas.create_text(
+            x,
+            y,
+            text=text,
+            fill=color,
+            font=("Arial", 10, "bold"),
+            state=state,
+            tags="packet",
+        )
+
+    def _release_item(self, item_id):
+        if len(self.item_pool) < self.POOL_LIMIT:
+            self.canvas.itemconfig(item_id, state="hidden")
+            self.item_pool.append(item_id)
+        else:
+            self.canvas.delete(item_id)
+
+    def _set_low_detail(self, low: bool):
+        self.low_detail = low
+        if low:
+            # One call hides every label, pooled ones included
+            self.canvas.itemconfig("packet", state="hidden")
+        else:
+            for anim in self.animations:
+                self.canvas.itemconfig(anim["id"], state="normal")
+            self.canvas.itemconfig("density", state="hidden")
+            self.density_levels = [0] * len(self.density_levels)
+
+    def _draw_density(self, counts):
+        """
+        Low-detail rendering: each lane (the label rows, by sequence number mod
+        LANES) gets a strip of cells for data above one for ACKs, shaded by how
+        many packets are in that stretch of the path. Only changed cells are
+        reconfigured.
+        """
+        if self.density_items is None:
+            left, right = self.sender_x + 40, self.receiver_x - 40
+            width = (right - left) / self.LOD_BINS
+            self.density_items = []
+            for ack in (0, 1):
+                for lane in range(self.LANES):
+                    y = 100 + lane * 20
+                    top = y + 1 if ack else y - 9
+                    for b in range(self.LOD_BINS):
+                        x = left + b * width
+                        self.density_items.append(
+                            self.canvas.create_rectangle(
+                                x,
+                                top,
+                                x + width,
+                                top + 8,
+                                width=0,
+                                state="hidden",
+                                tags="density",
+                            )
+                        )
+            self.density_levels = [0] * len(self.density_items)
+
+        cells = self.LANES * self.LOD_BINS
+        for i, count in enumerate(counts):
+            # Levels 0, 1, 2-3, 4-7, 8+
+            level = min(count.bit_length(), 4)
+            if level != self.density_levels[i]:
+                self.density_levels[i] = level
+                if level:
+                    color = self._DENSITY_COLORS[i >= cells][level]
+                    self.canvas.itemconfig(
+                        self.density_items[i], fill=color, state="normal"
+                    )
+                else:
+                    self.canvas.itemconfig(self.density_items[i], state="hidden")
 
     def _animate(self):
         current_time = time.time()
-        to_remove = []
-
-        for anim in self.animations:
-            if anim["status"] == "lost":
-                # Fade out or just stop
-                # For simplicity, let's just remove it after a bit
-                if (
-                    current_time > anim["end_time"]
-                ):  # Lost packets "disappear" when they would have arrived
-                    self.canvas.delete(anim["id"])
-                    to_remove.append(anim)
-                continue
-
-            progress = (current_time - anim["start_time"]) / (
-                anim["end_time"] - anim["start_time"]
-            )
+        animations = self.animations
+        if not self.low_detail and len(animations) > self.LOD_ENTER:
+            self._set_low_detail(True)
+        elif self.low_detail and len(animations) < self.LOD_EXIT:
+            self._set_low_detail(False)
+        low_detail = self.low_detail
+        if low_detail:
+            bins = self.LOD_BINS
+            counts = [0] * (2 * self.LANES * bins)
+
+        # Backwards, so a swap-remove only moves an already visited animation
+        for i in range(len(animations) - 1, -1, -1):
+            anim = animations[i]
+            if current_time >= anim["end_time"]:
+                # Arrived; lost packets "disappear" when they would have arrived
+                self._remove_animation(anim)
+            elif anim["status"] != "lost":
+                progress = (current_time - anim["start_time"]) / (
+                    anim["end_time"] - anim["start_time"]
+                )
+                if low_detail:
+                    ack = anim["start_x"] > anim["end_x"]
+                    # Cells run sender to receiver, so ACKs fill them in reverse
+                    b = min(int((1 - progress if ack else progress) * bins), bins - 1)
+                    lane = (anim["y"] - 100) // 20
+                    counts[(ack * self.LANES + lane) * bins + b] += 1
+                else:
+                    new_x = (
+                        anim["start_x"] + (anim["end_x"] - anim["start_x"]) * progress
+                    )
+                    self.canvas.coords(anim["id"], new_x, anim["y"])
 
-            if progress >= 1.0:
-                # Arrived
-                self.canvas.delete(anim["id"])
-                to_remove.append(anim)
-            else:
-                # Move
-                new_x = anim["start_x"] + (anim["end_x"] - anim["start_x"]) * progress
-                self.canvas.coords(anim["id"], new_x, anim["y"])
-
-        for anim in to_remove:
-            self.animations.remove(anim)
+        if low_detail:
+            self._draw_density(counts)
 
 
 if __name__ == "__main__":
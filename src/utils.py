@@ -1,3 +1,4 @@
+import hashlib
 import zlib
 
 
@@ -13,3 +14,40 @@ def verify_checksum(data: bytes, checksum: int) -> bool:
     Verifies if the data matches the checksum.
     """
     return calculate_checksum(data) == checksum
+
+
+def segment_stream(data, segment_size: int):
+    """
+    Lazily splits data into segment_size chunks. Every chunk but the last is full.
+    Accepts a bytes-like object, a file-like object with read(),
+    or any iterable (e.g. a generator) of bytes chunks of arbitrary size.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        for i in range(0, len(data), segment_size):
+            yield bytes(data[i : i + segment_size])
+        return
+
+    if hasattr(data, "read"):
+        chunks = iter(lambda: data.read(segment_size), b"")
+    else:
+        chunks = iter(data)
+
+    pending = bytearray()
+    for chunk in chunks:
+        pending += chunk
+        while len(pending) >= segment_size:
+            yield bytes(pending[:segment_size])
+            del pending[:segment_size]
+    if pending:
+        yield bytes(pending)
+
+
+def derive_seed(master_seed, *stream) -> int:
+    """
+    Derives an independent 64-bit seed for a named stream (e.g. "forward")
+    from a master seed. Returns None if master_seed is None.
+    """
+    if master_seed is None:
+        return None
+    key = repr((master_seed,) + stream).encode()
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], "big")
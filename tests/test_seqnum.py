@@ -0,0 +1,42 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_cli(*args):
+    return subprocess.run(
+        [sys.executable, "-m", "src.cli", *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+class SmallSequenceSpaceTest(unittest.TestCase):
+    # Used to finish with "Data Integrity: FAIL": a jittered duplicate of an
+    # early segment arrived after its 3-bit number was reused
+    ALIASING_RUN = (
+        "--protocol sr --size 20000 --loss 0.1 --corruption 0.05 --delay 0.05 "
+        "--timeout 0.05 --window 4 --seq-bits 3 --clock virtual --seed 1"
+    ).split()
+
+    def test_rejected_on_a_jittered_channel(self):
+        result = run_cli(*self.ALIASING_RUN)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("need an in-order channel", result.stderr)
+        self.assertNotIn("Data Integrity", result.stdout)
+
+    def test_in_order_channel_keeps_integrity(self):
+        args = list(self.ALIASING_RUN)
+        args[args.index("--delay") + 1] = "0"
+        result = run_cli(*args)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Data Integrity: PASS", result.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()